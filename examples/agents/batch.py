@@ -0,0 +1,19 @@
+from micro_graph import Node, NodeResult, OutputWriter
+from micro_graph.ai.llm import get_llm_and_model_from_env
+
+from examples.agents.planner import planner_agent
+
+
+def planner_graph() -> Node:
+    """
+    Create plans for many queries at once, e.g. with a fake LLM:
+
+        PROVIDER=fake python -m micro_graph.batch examples.agents.batch:planner_graph queries.jsonl plans.jsonl
+    """
+    llm, model = get_llm_and_model_from_env()
+    agent, _ = planner_agent(llm, model=model, max_iterations=3)
+
+    async def plan(output: OutputWriter, shared: dict, query: str = "", context: str = "", **kwargs) -> NodeResult:
+        return {"plan": await agent(output, query, context)}
+
+    return Node(run=plan)
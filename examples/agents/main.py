@@ -16,7 +16,7 @@ def main():
     agents["planner"], nodes["plan"] = planner_agent(llm, model=model, max_iterations=3)
 
     # Serve agents via chat api
-    serve({k: wrap_agent(llm, model, v) for k, v in agents.items()})
+    serve({k: wrap_agent(llm, model, v, name=k) for k, v in agents.items()})
 
 
 if __name__ == "__main__":
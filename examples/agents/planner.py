@@ -1,4 +1,4 @@
-from micro_graph import Node, OutputWriter
+from micro_graph import Node, OutputWriter, DeadlineExceeded
 from micro_graph.ai.llm_generation import LLMGenerateNode
 from micro_graph.ai.llm import LLM
 from micro_graph.ai.types import Agent
@@ -101,11 +101,18 @@ def planner_agent(llm: LLM, model: str, max_iterations: int = 5) -> tuple[Agent,
         model=model,
         feedback_template=PLANNING_FEEDBACK,
         max_iterations=max_iterations,
+        pipelined=True,
+        convergence_threshold=0.95,
     )
 
     async def agent(output: OutputWriter, query: str, context: str):
         shared = {}
-        await plan(output, shared=shared, query=query, plan=context)
+        try:
+            await plan(output, shared=shared, query=query, plan=context)
+        except DeadlineExceeded:
+            if "plan" not in shared:
+                raise
+            output.thought("Deadline exceeded. Returning the last plan.")
         return shared["plan"]
 
     return agent, plan
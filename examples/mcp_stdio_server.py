@@ -0,0 +1,28 @@
+"""
+A tiny local MCP server (stdio) to try out and test `MCPNode` without a real tool server:
+
+    node = MCPNode("python examples/mcp_stdio_server.py", mode="stdio", idempotent_tools=["add"])
+    await node.call_tools([("add", {"a": 1, "b": 2}), ("sleep", {"seconds": 0.5})])
+"""
+import asyncio
+
+from fastmcp import FastMCP
+
+mcp = FastMCP("micro-graph-example")
+
+
+@mcp.tool
+def add(a: float, b: float) -> float:
+    """Add two numbers."""
+    return a + b
+
+
+@mcp.tool
+async def sleep(seconds: float) -> str:
+    """Wait for some seconds, to simulate a slow tool."""
+    await asyncio.sleep(seconds)
+    return f"Slept {seconds} seconds."
+
+
+if __name__ == "__main__":
+    mcp.run()
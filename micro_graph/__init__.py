@@ -1,3 +1,8 @@
-from micro_graph.micro_graph import Node, NodeResult, OutputWriter, GraphResult, RunFunction, template_formatting
+from micro_graph.micro_graph import Node, ForkJoinNode, NodeResult, OutputWriter, GraphResult, RunFunction, template_formatting
+from micro_graph.shared_state import SharedState, MergeConflictError
+from micro_graph.deadline import Deadline, DeadlineExceeded
 
-__all__ = ["Node", "NodeResult", "OutputWriter", "GraphResult", "RunFunction", "template_formatting"]
+__all__ = [
+    "Node", "ForkJoinNode", "NodeResult", "OutputWriter", "GraphResult", "RunFunction", "template_formatting",
+    "SharedState", "MergeConflictError", "Deadline", "DeadlineExceeded",
+]
@@ -1,34 +1,128 @@
-from micro_graph import Node, NodeResult, OutputWriter
+from difflib import SequenceMatcher
+import asyncio
+
+from micro_graph import Node, NodeResult, OutputWriter, SharedState, Deadline
 from micro_graph.ai.llm_generation import LLMGenerateNode, LLMDecisionNode
 from micro_graph.ai.llm import LLM
 
 
-def automatic_refinement_feedback_loop(node: Node, llm: LLM, model: str, feedback_template: str, max_iterations: int = 5):
+FEEDBACK_ACCEPTANCE = "You are a meta reviewer. Based on the feedback you decide if the result requires more iterations (reject) or if the result is already good enough and the feedback is just critiquing irrelevant details (accept).\n"\
+    "Feedback:\n```\n{feedback}\n```\n\nWhat do you recommend? (accept/reject)"
+
+
+class _RecordingOutputWriter(OutputWriter):
+    """Records the output of a speculative run, so it can be replayed if the run is kept."""
+
+    def __init__(self):
+        super().__init__()
+        self._records: list[tuple[str, str | None]] = []
+
+    def write(self, text: str, message_type: str | None = None) -> None:
+        self._records.append((text, message_type))
+
+    def replay(self, output: OutputWriter) -> None:
+        for text, message_type in self._records:
+            output.write(text, message_type=message_type)
+
+
+def automatic_refinement_feedback_loop(
+    node: Node,
+    llm: LLM,
+    model: str,
+    feedback_template: str,
+    max_iterations: int = 5,
+    pipelined: bool = False,
+    convergence_threshold: float | None = None,
+    max_feedback_history: int = 3,
+):
     """
     Automatically refine the output of a node by recieving feedback from an LLM and iterating until the feedback is accepted or max_iterations is reached.
+
+    If `pipelined` is set, the next iteration is generated speculatively while the decision is made and discarded if the feedback is accepted.
+    If `convergence_threshold` is set, the loop stops early once two consecutive outputs are at least that similar (0.0 to 1.0).
+    Only the last `max_feedback_history` (deduplicated) feedbacks are passed on as `old_feedback`.
+    The result of every iteration (including its writes to `shared`) is reported as partial result to the active `Deadline`.
     """
-    async def loop_node(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
-        feedback_acceptance="You are a meta reviewer. Based on the feedback you decide if the result requires more iterations (reject) or if the result is already good enough and the feedback is just critiquing irrelevant details (accept).\n"\
-            "Feedback:\n```\n{feedback}\n```\n\nWhat do you recommend? (accept/reject)"
+    feedback = LLMGenerateNode(llm=llm, model=model, prompt_template=feedback_template, field="feedback")
+    decision = LLMDecisionNode(llm=llm, model=model, prompt_template=FEEDBACK_ACCEPTANCE, field="accept")
+
+    async def generate(output: OutputWriter, shared: dict, iteration: int, **kwargs):
+        output.thought(f"Generating output (iteration {iteration} of {max_iterations})")
+        return await node(output, shared, **kwargs)
+
+    async def speculate(shared: dict, iteration: int, **kwargs):
+        # Run on an overlay, so the writes only reach `shared` if the speculation is kept
+        fork = SharedState(parent=shared)
+        speculative_output = _RecordingOutputWriter()
+        node_result = await generate(speculative_output, fork, iteration, **kwargs)
+        return node_result, fork, speculative_output
 
-        feedback = LLMGenerateNode(llm=llm, model=model, prompt_template=feedback_template, field="feedback")
-        decision = LLMDecisionNode(llm=llm, model=model, prompt_template=feedback_acceptance, field="accept")
-        
+    async def loop_node(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
         node_result = None
         kwargs["feedback"] = ""
-        old_feedback= ""
-        for i in range(max_iterations):
-            output.thought(f"Generating output (iteration {i + 1} of {max_iterations})")
-            node_result = await node(output, shared, **kwargs)
-            output.thought("Giving feedback on the output")
-            feedback_result = await feedback(output, shared, iter=i+1, max_iter=max_iterations, old_feedback=old_feedback, **(node_result or {}))
-            if feedback_result is not None:
-                kwargs["feedback"] = feedback_result["feedback"]
-                old_feedback += feedback_result["feedback"] + "\n"
-            decision_result = await decision(output, shared, **(feedback_result or {}))
-            if decision_result is not None and decision_result["accept"].lower() == "accept":
-                break
-            if i == max_iterations - 1:
-                output.thought("Reached the maximum number of iterations. Returning the last result.")
+        feedback_history: list[str] = []
+        previous_output: str | None = None
+        written: set = set()  # keys of `shared` written by the iterations so far
+        speculative: asyncio.Task | None = None
+        try:
+            for i in range(max_iterations):
+                if speculative is None:
+                    before = dict(shared)
+                    node_result = await generate(output, shared, i + 1, **kwargs)
+                    written.update(k for k, v in shared.items() if k not in before or before[k] is not v)
+                else:
+                    node_result, fork, speculative_output = await speculative
+                    speculative = None
+                    written.update(fork.changes()[0])
+                    fork.commit()
+                    speculative_output.replay(output)
+                # Only compare what the node produced, not the inputs it passed through
+                produced = {**(node_result or {}), **{k: shared[k] for k in written if k in shared}}
+                current_output = repr({k: v for k, v in produced.items() if k not in kwargs or kwargs[k] != v})
+                deadline = Deadline.current()
+                if deadline is not None:
+                    deadline.report_partial(produced)
+                if _converged(previous_output, current_output, convergence_threshold):
+                    output.thought("Output converged. Returning the last result.")
+                    break
+                previous_output = current_output
+
+                output.thought("Giving feedback on the output")
+                old_feedback = _compress_feedback(feedback_history, max_feedback_history)
+                feedback_result = await feedback(output, shared, iter=i+1, max_iter=max_iterations, old_feedback=old_feedback, **(node_result or {}))
+                if feedback_result is not None:
+                    kwargs["feedback"] = feedback_result["feedback"]
+                    feedback_history.append(feedback_result["feedback"])
+                if pipelined and i < max_iterations - 1:
+                    speculative = asyncio.create_task(speculate(shared, i + 2, **kwargs))
+                decision_result = await decision(output, shared, **(feedback_result or {}))
+                if decision_result is not None and decision_result["accept"].lower() == "accept":
+                    break
+                if i == max_iterations - 1:
+                    output.thought("Reached the maximum number of iterations. Returning the last result.")
+        finally:
+            if speculative is not None:
+                speculative.cancel()
+                await asyncio.gather(speculative, return_exceptions=True)
         return node_result
     return Node(run=loop_node)
+
+
+def _converged(previous: str | None, current: str, threshold: float | None) -> bool:
+    if threshold is None or previous is None:
+        return False
+    matcher = SequenceMatcher(None, previous, current)
+    return matcher.quick_ratio() >= threshold and matcher.ratio() >= threshold
+
+
+def _compress_feedback(history: list[str], max_entries: int) -> str:
+    seen: set[str] = set()
+    entries: list[str] = []
+    for entry in reversed(history):
+        lines = [line for line in entry.splitlines() if line.strip() and line.strip() not in seen]
+        seen.update(line.strip() for line in lines)
+        if lines:
+            entries.append("\n".join(lines))
+        if len(entries) >= max_entries:
+            break
+    return "".join(entry + "\n" for entry in reversed(entries))
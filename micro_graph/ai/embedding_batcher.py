@@ -0,0 +1,114 @@
+from array import array
+import asyncio
+import base64
+import sys
+from typing import TYPE_CHECKING
+
+from micro_graph.ai.cache import LRUCache
+
+if TYPE_CHECKING:
+    from micro_graph.ai.llm import LLMAPI
+
+
+class EmbeddingBatcher:
+    """
+    Combines concurrent embedding requests into batched calls to the backend.
+
+    Requests arriving within `max_wait` seconds (or until `max_batch_size` unique inputs
+    are pending) are sent upstream in batches of at most `max_batch_size` per model. Identical inputs are only
+    embedded once, also across requests, and results are stored in the optional cache.
+    """
+
+    def __init__(
+        self,
+        llm: "LLMAPI",
+        max_batch_size: int = 256,
+        max_wait: float = 0.005,
+        cache: LRUCache | None = None,
+    ):
+        self._llm = llm
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._cache = cache
+        self._pending: dict[str, dict[str, asyncio.Future]] = {}
+        self._in_flight: dict[tuple[str, str], asyncio.Future] = {}
+        self._timers: dict[str, asyncio.Task] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def embed(self, model: str, inputs: list[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        results: list = [None] * len(inputs)
+        waiting: list[tuple[int, asyncio.Future]] = []
+        for i, text in enumerate(inputs):
+            if self._cache is not None and (model, text) in self._cache:
+                results[i] = self._cache.get((model, text))
+                continue
+            future = self._in_flight.get((model, text))
+            if future is None:
+                pending = self._pending.setdefault(model, {})
+                if text not in pending:
+                    pending[text] = loop.create_future()
+                future = pending[text]
+            waiting.append((i, future))
+        if model in self._pending:
+            self._schedule(model)
+        vectors = await asyncio.gather(*[asyncio.shield(future) for _, future in waiting])
+        for (i, _), vector in zip(waiting, vectors):
+            results[i] = vector
+        return results
+
+    def _schedule(self, model: str) -> None:
+        if len(self._pending[model]) >= self._max_batch_size:
+            timer = self._timers.pop(model, None)
+            if timer is not None:
+                timer.cancel()
+            self._start(self._flush(model))
+        elif model not in self._timers:
+            self._timers[model] = self._start(self._flush_later(model))
+
+    def _start(self, coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_later(self, model: str) -> None:
+        await asyncio.sleep(self._max_wait)
+        self._timers.pop(model, None)
+        await self._flush(model)
+
+    async def _flush(self, model: str) -> None:
+        batch = self._pending.pop(model, {})
+        texts = list(batch.keys())
+        chunks = [texts[i : i + self._max_batch_size] for i in range(0, len(texts), self._max_batch_size)]
+        await asyncio.gather(*[self._embed_chunk(model, {text: batch[text] for text in chunk}) for chunk in chunks])
+
+    async def _embed_chunk(self, model: str, batch: dict[str, asyncio.Future]) -> None:
+        texts = list(batch.keys())
+        for text in texts:
+            self._in_flight[(model, text)] = batch[text]
+        try:
+            vectors = await asyncio.to_thread(self._llm.embeddings, model, texts)
+            if len(vectors) != len(texts):
+                raise RuntimeError(f"Expected {len(texts)} embeddings, got {len(vectors)}.")
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            for text in texts:
+                self._in_flight.pop((model, text), None)
+        for text, vector in zip(texts, vectors):
+            if self._cache is not None:
+                self._cache.put((model, text), vector)
+            if not batch[text].done():
+                batch[text].set_result(vector)
+
+
+def encode_base64(vector: list[float]) -> str:
+    """Encode an embedding as base64 of little endian float32 values (like OpenAI does)."""
+    values = array("f", vector)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode("ascii")
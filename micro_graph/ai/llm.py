@@ -1,4 +1,6 @@
+from time import perf_counter, sleep
 from typing import Generator, List
+import hashlib
 import requests
 import os
 import openai
@@ -6,6 +8,14 @@ from openai import AzureOpenAI as _AzureAPI
 from openai import OpenAI as _OpenAIAPI
 
 from micro_graph.ai.types import ChatMessage
+from micro_graph.deadline import remaining_time
+from micro_graph.metrics import REGISTRY, RATE_BUCKETS
+
+LLM_REQUESTS = REGISTRY.counter("micro_graph_llm_requests_total", "LLM chat requests.", ("model", "status"))
+LLM_DURATION = REGISTRY.histogram("micro_graph_llm_request_duration_seconds", "Duration of LLM chat requests.", ("model",))
+LLM_TIME_TO_FIRST_TOKEN = REGISTRY.histogram("micro_graph_llm_time_to_first_token_seconds", "Time to the first streamed token.", ("model",))
+LLM_TOKENS = REGISTRY.counter("micro_graph_llm_completion_tokens_total", "Generated tokens (streamed chunks).", ("model",))
+LLM_TOKENS_PER_SECOND = REGISTRY.histogram("micro_graph_llm_tokens_per_second", "Generation speed of LLM requests.", ("model",), buckets=RATE_BUCKETS)
 
 
 class LLMAPI(object):
@@ -45,35 +55,105 @@ class LLM(LLMAPI):
                 self._llms[model] = _OpenAIAPI(base_url=api_endpoint, api_key=api_key)
 
     def embeddings(self, model: str, input: str | List[str]) -> List[List[float]]:
-        response = self._llms[model].embeddings.create(input=input, model=model)
+        response = self._llms[model].embeddings.create(input=input, model=model, **_timeout())
         return [d.embedding for d in response.data]
 
     def chat(self, model: str, messages: List[ChatMessage], max_tokens: int = -1) -> str:
+        start = perf_counter()
         try:            
-            response = self._llms[model].chat.completions.create(model=model, messages=messages, max_tokens=max_tokens, stream=False)
+            response = self._llms[model].chat.completions.create(model=model, messages=messages, max_tokens=max_tokens, stream=False, **_timeout())
         except openai.NotFoundError as e:
+            LLM_REQUESTS.inc(model=model, status="error")
             raise RuntimeError(str(e))
+        except Exception:
+            LLM_REQUESTS.inc(model=model, status="error")
+            raise
         if response.choices[0].finish_reason == "error":
+            LLM_REQUESTS.inc(model=model, status="error")
             raise RuntimeError(response.choices[0].message.content)
+        usage = getattr(response, "usage", None)
+        _record_completion(model, perf_counter() - start, usage.completion_tokens if usage else 0)
         return response.choices[0].message.content or ""
     
     def chat_stream(self, model: str, messages: List[ChatMessage], max_tokens: int = -1) -> Generator[str, None, None]:
+        start = perf_counter()
         try:            
-            response = self._llms[model].chat.completions.create(model=model, messages=messages, max_tokens=max_tokens, stream=True)
+            response = self._llms[model].chat.completions.create(model=model, messages=messages, max_tokens=max_tokens, stream=True, **_timeout())
         except openai.NotFoundError as e:
+            LLM_REQUESTS.inc(model=model, status="error")
             raise RuntimeError(str(e))
-        return LLM._stream_wrapper(response)
+        except Exception:
+            LLM_REQUESTS.inc(model=model, status="error")
+            raise
+        return LLM._stream_wrapper(response, model, start)
 
     def get_models(self) -> list[str]:
         return list(self._llms.keys())
 
     @staticmethod
-    def _stream_wrapper(stream):
-        for chunk in stream:
-            yield chunk.choices[0].delta.content or ""
+    def _stream_wrapper(stream, model: str, start: float):
+        tokens = 0
+        try:
+            for chunk in stream:
+                if tokens == 0:
+                    LLM_TIME_TO_FIRST_TOKEN.observe(perf_counter() - start, model=model)
+                tokens += 1
+                yield chunk.choices[0].delta.content or ""
+        except Exception:
+            LLM_REQUESTS.inc(model=model, status="error")
+            raise
+        _record_completion(model, perf_counter() - start, tokens)
+
+
+def _record_completion(model: str, duration: float, tokens: int) -> None:
+    LLM_REQUESTS.inc(model=model, status="ok")
+    LLM_DURATION.observe(duration, model=model)
+    if tokens > 0:
+        LLM_TOKENS.inc(tokens, model=model)
+        LLM_TOKENS_PER_SECOND.observe(tokens / max(duration, 1e-9), model=model)
+
+
+def _timeout() -> dict:
+    # Limit the request to the remaining time of the active graph run deadline (if any).
+    timeout = remaining_time()
+    return {} if timeout is None else {"timeout": timeout}
+
+
+class FakeLLM(LLMAPI):
+    """
+    A local stand-in for an LLM server for tests and dry runs.
+
+    Chat responses are the fixed `response` or echo the last message, embeddings are derived
+    from a hash of the input and every call takes `latency` seconds.
+    """
+
+    def __init__(self, response: str | None = None, latency: float = 0.0, dim: int = 16):
+        self._response = response
+        self._latency = latency
+        self._dim = dim
+
+    def embeddings(self, model: str, input: str | List[str]) -> List[List[float]]:
+        sleep(self._latency)
+        texts = [input] if isinstance(input, str) else input
+        return [[b / 255.0 for b in hashlib.sha256(text.encode()).digest()[: self._dim]] for text in texts]
+
+    def chat(self, model: str, messages: List[ChatMessage], max_tokens: int = -1) -> str:
+        sleep(self._latency)
+        if self._response is not None:
+            return self._response
+        return "Echo: " + (messages[-1].text() if messages else "")
+
+    def chat_stream(self, model: str, messages: List[ChatMessage], max_tokens: int = -1) -> Generator[str, None, None]:
+        for word in self.chat(model, messages, max_tokens).split(" "):
+            yield word + " "
+
+    def get_models(self) -> list[str]:
+        return ["fake"]
 
 
-def get_llm_and_model_from_env() -> tuple[LLM, str]:
+def get_llm_and_model_from_env() -> tuple[LLMAPI, str]:
+    if os.environ.get("PROVIDER") == "fake":
+        return FakeLLM(latency=float(os.environ.get("FAKE_LATENCY", "0"))), "fake"
     llm = LLM(
         api_endpoint=os.environ.get("API_ENDPOINT", "http://localhost:11434"),
         api_key=os.environ.get("API_KEY", "ollama"),
@@ -2,6 +2,7 @@ from micro_graph.micro_graph import Node, OutputWriter, template_formatting
 from micro_graph.ai.llm import LLM
 from micro_graph.ai.types import ChatMessage
 from typing import List
+import asyncio
 
 
 class LLMGenerateNode(Node):
@@ -26,16 +27,19 @@ class LLMGenerateNode(Node):
             ChatMessage(role="user", content=prompt)
         ]
         if self._output == "":
-            answer: str = self._llm.chat(
-                model=self._model, messages=messages, max_tokens=self._max_tokens
+            # run in a thread, so parallel nodes do not block each other
+            answer: str = await asyncio.to_thread(
+                self._llm.chat, model=self._model, messages=messages, max_tokens=self._max_tokens
             )
         else:
-            # only stream if we want to output the response
-            response = self._llm.chat_stream(
-                model=self._model, messages=messages, max_tokens=self._max_tokens
+            # only stream if we want to output the response, chunks are read in a thread,
+            # so the loop is not blocked and the node can be cancelled by its deadline
+            response = await asyncio.to_thread(
+                self._llm.chat_stream, model=self._model, messages=messages, max_tokens=self._max_tokens
             )
+            chunks = iter(response)
             answer = ""
-            for chunk in response:
+            while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
                 answer += chunk
                 output.write(chunk, message_type=self._output)
             output.write("\n", message_type=self._output) # Add a new line after we finished streaming
@@ -68,7 +72,8 @@ class LLMDecisionNode(Node):
             ChatMessage(role="system", content=self.system_prompt),
             ChatMessage(role="user", content=prompt)
         ]
-        response = self._llm.chat(
+        response = await asyncio.to_thread(
+            self._llm.chat,
             model=self._model,
             messages=messages,
             max_tokens=self._max_tokens,
@@ -1,12 +1,63 @@
+from time import perf_counter
+from typing import Any
+import asyncio
+import json
+
 from fastmcp import Client
 from fastmcp.client.transports import StreamableHttpTransport, SSETransport, StdioTransport
 
-from micro_graph import Node, NodeResult
+from micro_graph import Node, NodeResult, OutputWriter
+from micro_graph.ai.cache import LRUCache
 from micro_graph.ai.types import ToolInfo
+from micro_graph.deadline import DeadlineExceeded, run_with_timeout
+from micro_graph.metrics import REGISTRY
+
+TOOL_DURATION = REGISTRY.histogram("micro_graph_mcp_tool_duration_seconds", "Duration of MCP tool calls.", ("tool",))
+TOOL_CALLS = REGISTRY.counter("micro_graph_mcp_tool_calls_total", "MCP tool calls.", ("tool", "status"))
+
+ToolCall = tuple[str, dict[str, Any]]
+
+
+class ToolStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.calls if self.calls else 0.0
+
+    def __repr__(self) -> str:
+        return f"ToolStats(calls={self.calls}, errors={self.errors}, cache_hits={self.cache_hits}, " \
+            f"mean_seconds={self.mean_seconds:.3f}, max_seconds={self.max_seconds:.3f})"
 
 
 class MCPNode(Node):
-    def __init__(self, url_or_command, mode="http", header: dict[str, str] | None = None, max_retries: int = 0):
+    """
+    Node for micro-graph that calls tools of an MCP server.
+
+    Run it with `tool_name` and the tool arguments as kwargs, or with `tool_calls`
+    (a list of `{"name": ..., "arguments": {...}}`) to call several tools concurrently over one session.
+    A failing call in `tool_calls` does not discard the others, it results in `{"is_error": True, "error": ...}`.
+
+    Results of the `idempotent_tools` are cached by tool name and arguments,
+    for at most `cache_ttl` seconds (if given) and `cache_size` entries.
+    Per tool latency statistics are available in `tool_stats`.
+    """
+
+    def __init__(
+        self,
+        url_or_command,
+        mode="http",
+        header: dict[str, str] | None = None,
+        max_retries: int = 0,
+        idempotent_tools: list[str] | None = None,
+        cache_size: int = 1024,
+        cache_ttl: float | None = None,
+    ):
         super().__init__(max_retries=max_retries)
         if mode == "http":
             transport = StreamableHttpTransport(url_or_command, headers=header)
@@ -18,10 +69,13 @@ class MCPNode(Node):
         else:
             raise ValueError(f"Unsupported mode: {mode}")
         self._client = Client(transport=transport)
+        self._idempotent_tools = set(idempotent_tools or [])
+        self._cache = LRUCache(max_size=cache_size, ttl=cache_ttl) if self._idempotent_tools else None
+        self.tool_stats: dict[str, ToolStats] = {}
 
     async def list_tools(self) -> list[ToolInfo]:
         async with self._client:
-            tools = await self._client.list_tools()
+            tools = await run_with_timeout(self._client.list_tools())
             return [
                 ToolInfo(
                     name=tool.name,
@@ -31,7 +85,90 @@ class MCPNode(Node):
                 for tool in tools
             ]
 
-    async def run(self, shared: dict, tool_name: str = "", **kwargs) -> NodeResult:
-        async with self._client:
-            result =  await self._client.call_tool(name=tool_name, arguments=kwargs)
+    async def call_tools(self, calls: list[ToolCall], return_exceptions: bool = False) -> list[dict | Exception]:
+        """
+        Call several tools concurrently, identical calls of idempotent tools are only made once.
+
+        Successful results are cached even if other calls fail. The first error is raised afterwards,
+        or with `return_exceptions` returned in place of the result (a missed deadline is always raised).
+        """
+        results: list[dict | Exception | None] = [None] * len(calls)
+        requests: dict[Any, list[int]] = {}
+        for i, (name, arguments) in enumerate(calls):
+            idempotent = name in self._idempotent_tools
+            key = self._cache_key(name, arguments) if idempotent else i
+            cached = self._cache.get(key) if idempotent and self._cache is not None else None
+            if cached is not None:
+                self._stats(name).cache_hits += 1
+                results[i] = dict(cached)
+            else:
+                requests.setdefault(key, []).append(i)
+        if requests:
+            async with self._client:
+                responses = await asyncio.gather(
+                    *[self._call_tool(*calls[indices[0]]) for indices in requests.values()], return_exceptions=True
+                )
+            errors: list[BaseException] = []
+            for (key, indices), response in zip(requests.items(), responses):
+                if isinstance(response, BaseException):
+                    errors.append(response)
+                    for i in indices:
+                        results[i] = response  # type: ignore
+                    continue
+                if self._cache is not None and calls[indices[0]][0] in self._idempotent_tools:
+                    self._cache.put(key, response)
+                for i in indices:
+                    results[i] = dict(response)
+            for error in errors:
+                if not isinstance(error, Exception) or isinstance(error, DeadlineExceeded):
+                    raise error
+            if errors and not return_exceptions:
+                raise errors[0]
+        return results  # type: ignore
+
+    async def run(
+        self,
+        output: OutputWriter,
+        shared: dict,
+        tool_name: str = "",
+        tool_calls: list[dict] | None = None,
+        **kwargs,
+    ) -> NodeResult:
+        if tool_calls is not None:
+            calls = [(call["name"], call.get("arguments", {})) for call in tool_calls]
+            results = await self.call_tools(calls, return_exceptions=True)
+            return {
+                "results": [
+                    {"is_error": True, "error": f"{type(result).__name__}: {result}"} if isinstance(result, Exception) else result
+                    for result in results
+                ]
+            }
+        return (await self.call_tools([(tool_name, kwargs)]))[0]  # type: ignore
+
+    async def _call_tool(self, name: str, arguments: dict[str, Any]) -> dict:
+        stats = self._stats(name)
+        start = perf_counter()
+        status = "ok"
+        try:
+            result = await run_with_timeout(self._client.call_tool(name=name, arguments=arguments))
             return dict(result.__dict__)
+        except Exception:
+            status = "error"
+            stats.errors += 1
+            raise
+        finally:
+            duration = perf_counter() - start
+            stats.calls += 1
+            stats.total_seconds += duration
+            stats.max_seconds = max(stats.max_seconds, duration)
+            TOOL_DURATION.observe(duration, tool=name)
+            TOOL_CALLS.inc(tool=name, status=status)
+
+    def _stats(self, name: str) -> ToolStats:
+        if name not in self.tool_stats:
+            self.tool_stats[name] = ToolStats()
+        return self.tool_stats[name]
+
+    @staticmethod
+    def _cache_key(name: str, arguments: dict[str, Any]) -> str:
+        return name + ":" + json.dumps(arguments, sort_keys=True, separators=(",", ":"), default=str)
@@ -1,6 +1,6 @@
 from micro_graph.ai.llm import LLMAPI
 from typing import Callable, Awaitable
-from time import time
+from time import time, perf_counter
 from uuid import uuid4
 import asyncio
 import json
@@ -8,12 +8,18 @@ import logging
 
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import StreamingResponse
 import uvicorn
 
-from micro_graph.ai.types import ChatMessage, ChatCompletionRequest, Agent
+from micro_graph.ai.cache import LRUCache
+from micro_graph.ai.embedding_batcher import EmbeddingBatcher, encode_base64
+from micro_graph.ai.replay_buffer import ReplayBuffer
+from micro_graph.ai.semantic_cache import SemanticCache
+from micro_graph.ai.types import ChatMessage, ChatCompletionRequest, EmbeddingRequest, Agent
+from micro_graph.deadline import Deadline, DeadlineExceeded, run_with_timeout
+from micro_graph.metrics import REGISTRY
 from micro_graph.output_writer import OutputWriter
 
 
@@ -50,9 +56,34 @@ User Query: {query}
 
 ChatAgent = Callable[[OutputWriter, list[ChatMessage], int], Awaitable[None]]
 
+HTTP_REQUESTS = REGISTRY.counter("micro_graph_http_requests_total", "HTTP requests per endpoint.", ("endpoint", "model"))
+GRAPH_RUNS = REGISTRY.counter("micro_graph_graph_runs_total", "Finished graph runs.", ("model", "status"))
+GRAPH_RUNS_IN_FLIGHT = REGISTRY.gauge("micro_graph_graph_runs_in_flight", "Currently running graphs.", ("model",))
+GRAPH_RUN_DURATION = REGISTRY.histogram("micro_graph_graph_run_duration_seconds", "Duration of graph runs.", ("model",))
+UNKNOWN_MODEL = "unknown"  # metric label for requests of models that do not exist (bounds the number of series)
+TIME_TO_FIRST_CHUNK = REGISTRY.histogram("micro_graph_time_to_first_chunk_seconds", "Time until the first output chunk of a graph run.", ("model",))
+OUTPUT_QUEUE_DEPTH = REGISTRY.gauge("micro_graph_output_queue_depth", "Chunks waiting in OutputWriter queues of all requests.")
+AGENT_RUNS = REGISTRY.counter("micro_graph_agent_runs_total", "Runs of wrapped agents.", ("agent", "status"))
+AGENT_DURATION = REGISTRY.histogram("micro_graph_agent_duration_seconds", "Duration of wrapped agents (without query extraction).", ("agent",))
 
-def create_app(chat_agents: dict[str, ChatAgent], debug=False) -> FastAPI:
+_active_queues: set[ReplayBuffer] = set()
+OUTPUT_QUEUE_DEPTH.set_function(lambda: sum(queue.qsize() for queue in list(_active_queues)))
+
+
+def create_app(
+    chat_agents: dict[str, ChatAgent],
+    debug=False,
+    embedding_llm: LLMAPI | None = None,
+    embedding_cache_size: int = 10000,
+    timeout: float | None = None,
+    replay_buffer_size: int = 4096,
+    replay_ttl: float = 60.0,
+) -> FastAPI:
     app = FastAPI(title="OpenAI Server")
+    embedder: EmbeddingBatcher | None = None
+    if embedding_llm is not None:
+        cache = LRUCache(max_size=embedding_cache_size) if embedding_cache_size > 0 else None
+        embedder = EmbeddingBatcher(embedding_llm, cache=cache)
 
     # Set up logging
     logger = logging.getLogger("openai_server")
@@ -76,75 +107,150 @@ def create_app(chat_agents: dict[str, ChatAgent], debug=False) -> FastAPI:
         allow_credentials=True,
     )
 
-    async def _wrap_chat_generator(stream, model):
-        i = 0
-        async for token in stream:
-            chunk = {
-                "id": i,
-                "object": "chat.completion.chunk",
-                "created": int(time()),
-                "model": model,
-                "choices": [{"delta": {"content": token, "role": "assistant"}}],
-            }
-            i += 1
-            if debug:
-                logger.debug(f"CHUNK: {json.dumps(chunk)}")
-            yield f"data: {json.dumps(chunk)}\n\n"
+    # Output of streamed requests by request id, kept for `replay_ttl` seconds after the run finished,
+    # so clients can resume streams (see `Last-Event-ID`)
+    replay_buffers: dict[str, ReplayBuffer] = {}
+    run_tasks: dict[str, asyncio.Task] = {}
+    _abandon_watchers: set[asyncio.Task] = set()
+
+    def _evict_replay_buffer(request_id: str, buffer: ReplayBuffer):
+        if replay_buffers.get(request_id) is buffer:
+            del replay_buffers[request_id]
+
+    async def _cancel_if_abandoned(request_id: str, buffer: ReplayBuffer, task: asyncio.Task):
+        await asyncio.sleep(replay_ttl)
+        if buffer.abandoned(replay_ttl):
+            logger.info(f"No client reconnected to '{request_id}' within {replay_ttl}s, cancelling the run.")
+            task.cancel()
+            _evict_replay_buffer(request_id, buffer)
+
+    async def _wrap_chat_generator(stream, model, request_id):
+        try:
+            async for i, token in stream:
+                chunk = {
+                    "id": request_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time()),
+                    "model": model,
+                    "choices": [{"delta": {"content": token, "role": "assistant"}}],
+                }
+                if debug:
+                    logger.debug(f"CHUNK: {json.dumps(chunk)}")
+                yield f"id: {request_id}:{i}\ndata: {json.dumps(chunk)}\n\n"
+        finally:
+            await stream.aclose()
         if debug:
             logger.debug("CHUNK: [DONE]")
         yield "data: [DONE]\n\n"
 
-    @app.post("/chat/completions")
-    async def chat_completions(request: ChatCompletionRequest):
-        if debug:
-            logger.debug(f"REQUEST: {request}")
-        reason = "stop"
-        try:
-
-            async def generator():
-                queue = asyncio.Queue()
-                output: OutputWriter = OutputWriter(queue=queue)
+    def _chat_model_label(model: str) -> str:
+        return model if model in chat_agents else UNKNOWN_MODEL
 
-                # Run the graph in a background task
-                async def run_graph():
-                    await chat_agents[request.model](
-                        output, request.messages, request.max_tokens or -1
+    def _embedding_model_label(model: str) -> str:
+        try:
+            models = embedding_llm.get_models() if embedding_llm is not None else []
+        except NotImplementedError:
+            models = []
+        return model if model in models else UNKNOWN_MODEL
+
+    def _start_graph(request: ChatCompletionRequest, request_id: str, buffer: ReplayBuffer) -> asyncio.Task:
+        output: OutputWriter = OutputWriter(queue=buffer)  # type: ignore
+        start = perf_counter()
+        model = _chat_model_label(request.model)
+
+        async def run_graph():
+            status = "ok"
+            GRAPH_RUNS_IN_FLIGHT.inc(model=model)
+            try:
+                with Deadline(timeout):
+                    await run_with_timeout(
+                        chat_agents[request.model](
+                            output, request.messages, request.max_tokens or -1
+                        )
                     )
-                    await queue.put(None)  # Sentinel to signal completion
-
-                asyncio.create_task(run_graph())
+            except DeadlineExceeded:
+                status = "timeout"
+                logger.warning(f"Deadline of {timeout}s exceeded for model '{request.model}'.")
+                output.default("Error: The request timed out.")
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            except Exception as e:
+                status = "error"
+                logger.exception(e)
+                output.default(f"Error: {e}")
+            finally:
+                GRAPH_RUNS_IN_FLIGHT.dec(model=model)
+                GRAPH_RUNS.inc(model=model, status=status)
+                GRAPH_RUN_DURATION.observe(perf_counter() - start, model=model)
+                buffer.put_nowait(None)  # Sentinel to signal completion
+                _active_queues.discard(buffer)
+                if request_id in replay_buffers:
+                    asyncio.get_running_loop().call_later(replay_ttl, _evict_replay_buffer, request_id, buffer)
+
+        _active_queues.add(buffer)
+        return asyncio.create_task(run_graph())
+
+    async def _generator(request: ChatCompletionRequest, request_id: str, buffer: ReplayBuffer, last_id: int = -1):
+        start = perf_counter()
+        stream = buffer.stream(last_id)
+        try:
+            async for i, chunk in stream:
+                if i == 0:
+                    TIME_TO_FIRST_CHUNK.observe(perf_counter() - start, model=_chat_model_label(request.model))
+                yield i, chunk
+        finally:
+            await stream.aclose()  # detach from the buffer now, not when the stream is garbage collected
+            task = run_tasks.get(request_id)
+            # Stop the graph if the client is gone and does not reconnect in time to resume the stream
+            if task is not None and not buffer.done and buffer.readers == 0:
+                if replay_ttl <= 0:
+                    task.cancel()
+                else:
+                    watcher = asyncio.create_task(_cancel_if_abandoned(request_id, buffer, task))
+                    _abandon_watchers.add(watcher)
+                    watcher.add_done_callback(_abandon_watchers.discard)
 
-                while True:
-                    chunk: str | None = await queue.get()
-                    if chunk is None:
-                        break
-                    yield chunk
+    @app.post("/chat/completions")
+    async def chat_completions(request: ChatCompletionRequest, http_request: Request):
+        if debug:
+            logger.debug(f"REQUEST: {request}")
+        HTTP_REQUESTS.inc(endpoint="/chat/completions", model=_chat_model_label(request.model))
+        last_event_id = http_request.headers.get("last-event-id")
+        if last_event_id is not None and request.stream:
+            request_id, _, last_id = last_event_id.rpartition(":")
+            buffer = replay_buffers.get(request_id)
+            if buffer is None or not last_id.isdigit() or not buffer.can_resume(int(last_id)):
+                content = {"status_code": 410, "message": f"Cannot resume stream '{last_event_id}'.", "data": None}
+                return JSONResponse(content=content, status_code=status.HTTP_410_GONE)
+            return StreamingResponse(
+                _wrap_chat_generator(_generator(request, request_id, buffer, int(last_id)), request.model, request_id),
+                media_type="text/event-stream",
+            )
 
-            response = generator()
-        except RuntimeError as e:
-            response = str(e)
-            reason = "error"
+        request_id = str(uuid4())
+        buffer = ReplayBuffer(max_chunks=replay_buffer_size)
+        if replay_ttl > 0 and request.stream:
+            replay_buffers[request_id] = buffer
+        run_tasks[request_id] = _start_graph(request, request_id, buffer)
+        run_tasks[request_id].add_done_callback(lambda _: run_tasks.pop(request_id, None))
+        response = _generator(request, request_id, buffer)
         if request.stream:
-            if isinstance(response, str):
-                response = [response]
             return StreamingResponse(
-                _wrap_chat_generator(response, request.model),
+                _wrap_chat_generator(response, request.model, request_id),
                 media_type="text/event-stream",
             )
-        if not isinstance(response, str):
-            response_str: str = ""
-            async for chunk in response:
-                response_str += chunk
-        else:
-            response_str = response
+        response_str: str = ""
+        async for _, chunk in response:
+            response_str += chunk
         response_obj = {
-            "id": str(uuid4()),
+            "id": request_id,
             "object": "chat.completion",
             "model": request.model,
             "created": int(time()),
             "choices": [
                 {
-                    "finish_reason": reason,
+                    "finish_reason": "stop",
                     "message": ChatMessage(role="assistant", content=response_str),
                 }
             ],
@@ -153,6 +259,41 @@ def create_app(chat_agents: dict[str, ChatAgent], debug=False) -> FastAPI:
             logger.debug(f"RESPONSE: {response_obj}")
         return response_obj
 
+    @app.post("/embeddings")
+    async def embeddings(request: EmbeddingRequest):
+        if debug:
+            logger.debug(f"REQUEST: {request}")
+        HTTP_REQUESTS.inc(endpoint="/embeddings", model=_embedding_model_label(request.model))
+        if embedder is None:
+            content = {"status_code": 404, "message": "No embedding model configured.", "data": None}
+            return JSONResponse(content=content, status_code=status.HTTP_404_NOT_FOUND)
+        if request.encoding_format not in (None, "float", "base64"):
+            content = {"status_code": 400, "message": f"Unsupported encoding_format '{request.encoding_format}'.", "data": None}
+            return JSONResponse(content=content, status_code=status.HTTP_400_BAD_REQUEST)
+        inputs = [request.input] if isinstance(request.input, str) else request.input
+        try:
+            vectors = await embedder.embed(request.model, inputs)
+        except KeyError:
+            content = {"status_code": 404, "message": f"Unknown embedding model '{request.model}'.", "data": None}
+            return JSONResponse(content=content, status_code=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.exception(e)
+            content = {"status_code": 500, "message": str(e), "data": None}
+            return JSONResponse(content=content, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        as_base64 = request.encoding_format == "base64"
+        return {
+            "object": "list",
+            "model": request.model,
+            "data": [
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": encode_base64(vector) if as_base64 else vector,
+                }
+                for i, vector in enumerate(vectors)
+            ],
+        }
+
     @app.get("/models")
     def openai_models():
         response = {
@@ -171,6 +312,10 @@ def create_app(chat_agents: dict[str, ChatAgent], debug=False) -> FastAPI:
             logger.debug(f"RESPONSE: {response}")
         return response
 
+    @app.get("/metrics")
+    def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
     @app.exception_handler(RequestValidationError)
     async def validation_exception_handler(request: Request, exc: RequestValidationError):
         exc_str = f"{exc}".replace("\n", " ").replace("   ", " ")
@@ -186,12 +331,23 @@ def wrap_agent(
     llm: LLMAPI,
     model: str,
     agent: Agent,
+    name: str | None = None,
+    cache: SemanticCache | None = None,
 ) -> ChatAgent:
+    """
+    Turn an agent into a chat agent by extracting the query and context from the chat.
+
+    If a `cache` is given, results of semantically similar queries (and contexts) are reused.
+    """
+    agent_name = name or getattr(agent, "__qualname__", "agent")
+    pending_stores: set[asyncio.Task] = set()
+
     async def chat_agent(
         output: OutputWriter, chat_messages: list[ChatMessage], max_tokens: int
     ):
         output.thought("Extracting query")
-        query: str = llm.chat(
+        query: str = await asyncio.to_thread(
+            llm.chat,
             model,
             chat_messages[-3:] + [ChatMessage(role="user", content=QUERY_EXTRACTOR)],
             max_tokens=max_tokens,
@@ -201,23 +357,58 @@ def wrap_agent(
         if len(chat_messages) > 2:
             output.thought("Extracting context")
             prompt = CONTEXT_EXTRACTOR.format(query=query)
-            context: str = llm.chat(
+            context: str = await asyncio.to_thread(
+                llm.chat,
                 model,
                 chat_messages[-3:] + [ChatMessage(role="user", content=prompt)],
                 max_tokens=max_tokens,
             )
-        result = await agent(output, query, context)
+        if cache is not None:
+            cache_key = query if context == "" else f"{context}\n\n{query}"
+            try:
+                cached, vector = await cache.lookup(cache_key)
+            except Exception as e:
+                # the cache is only an optimization, treat errors as a miss
+                logging.getLogger("openai_server").warning(f"Semantic cache lookup failed: {e}")
+                cached, vector = None, None
+            if cached is not None:
+                output.thought("Found a cached answer for a similar query")
+                output.default(cached)
+                return
+        start = perf_counter()
+        try:
+            result = await agent(output, query, context)
+        except Exception:
+            AGENT_RUNS.inc(agent=agent_name, status="error")
+            raise
+        finally:
+            AGENT_DURATION.observe(perf_counter() - start, agent=agent_name)
+        AGENT_RUNS.inc(agent=agent_name, status="ok")
         if result is not None and result != "":
             output.default(result)
+            if cache is not None and vector is not None:
+                # store in the background, so the response does not wait for the disk
+                task = asyncio.create_task(_store(cache, cache_key, vector, result))
+                pending_stores.add(task)
+                task.add_done_callback(pending_stores.discard)
 
     return chat_agent
 
 
+async def _store(cache: SemanticCache, text: str, vector, result: str) -> None:
+    try:
+        await cache.store(text, vector, result)
+    except Exception as e:
+        logging.getLogger("openai_server").warning(f"Semantic cache store failed: {e}")
+
+
 def serve(
     chat_agents: dict[str, ChatAgent],
     host: str = "localhost",
     port: int = 8000,
     debug=False,
+    embedding_llm: LLMAPI | None = None,
+    timeout: float | None = None,
 ):
-    app = create_app(chat_agents, debug=debug)
+    app = create_app(chat_agents, debug=debug, embedding_llm=embedding_llm, timeout=timeout)
     uvicorn.run(app, host=host, port=port)
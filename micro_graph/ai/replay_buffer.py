@@ -0,0 +1,89 @@
+from collections import deque
+from time import monotonic
+from typing import AsyncGenerator
+import asyncio
+
+
+class ReplayBuffer:
+    """
+    A buffer of the output chunks of one request, numbered sequentially.
+
+    It can be used as queue for an `OutputWriter` (`put_nowait(None)` marks the end).
+    Any number of consumers can `stream` the chunks, starting after any chunk id that
+    is still buffered, which allows clients to resume a stream after reconnecting.
+    Chunks that a connected consumer has not read yet are always kept, of the delivered
+    chunks only the last `max_chunks` are kept for resuming.
+    """
+
+    def __init__(self, max_chunks: int = 4096):
+        self._max_chunks = max_chunks
+        self._chunks: deque[str] = deque()
+        self._first_id = 0
+        self._next_id = 0
+        self._delivered = -1
+        self._readers: dict[object, int] = {}  # next chunk id per connected consumer
+        self._changed = asyncio.Event()
+        self.done = False
+        self.detached_at: float | None = monotonic()
+
+    @property
+    def readers(self) -> int:
+        return len(self._readers)
+
+    def put_nowait(self, chunk: str | None) -> None:
+        if chunk is None:
+            self.done = True
+        else:
+            self._chunks.append(chunk)
+            self._next_id += 1
+            self._trim()
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def put(self, chunk: str | None) -> None:
+        self.put_nowait(chunk)
+
+    def qsize(self) -> int:
+        """The number of chunks no consumer has received yet."""
+        return self._next_id - self._delivered - 1
+
+    def abandoned(self, ttl: float) -> bool:
+        """True if the output is not done and no consumer was connected for `ttl` seconds."""
+        return not self.done and self.detached_at is not None and monotonic() - self.detached_at >= ttl
+
+    def can_resume(self, last_id: int) -> bool:
+        return self._first_id <= last_id + 1 <= self._next_id
+
+    async def stream(self, last_id: int = -1) -> AsyncGenerator[tuple[int, str], None]:
+        """Yield `(id, chunk)` for all chunks after `last_id` until the output is done."""
+        reader = object()
+        next_id = last_id + 1
+        self._readers[reader] = next_id
+        self.detached_at = None
+        try:
+            while True:
+                changed = self._changed
+                while next_id < self._next_id:
+                    if next_id < self._first_id:
+                        raise LookupError(f"Chunk {next_id} is no longer buffered.")
+                    chunk = self._chunks[next_id - self._first_id]
+                    self._delivered = max(self._delivered, next_id)
+                    yield next_id, chunk
+                    next_id += 1
+                    self._readers[reader] = next_id
+                if self.done:
+                    return
+                await changed.wait()
+        finally:
+            del self._readers[reader]
+            if not self._readers:
+                self.detached_at = monotonic()
+            self._trim()
+
+    def _trim(self) -> None:
+        # Only drop chunks that were delivered and that no connected consumer still needs
+        needed = min(self._readers.values(), default=self._delivered + 1)
+        limit = min(needed, self._delivered + 1)
+        while len(self._chunks) > self._max_chunks and self._first_id < limit:
+            self._chunks.popleft()
+            self._first_id += 1
@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from micro_graph.metrics import REGISTRY
+
+if TYPE_CHECKING:
+    from micro_graph.ai.llm import LLMAPI
+
+CACHE_LOOKUPS = REGISTRY.counter("micro_graph_semantic_cache_lookups_total", "Semantic cache lookups.", ("result",))
+
+
+class VectorIndex:
+    """
+    A fixed capacity cosine similarity index over contiguous float32 storage.
+
+    Vectors are normalized on insert, so a search is a single matrix-vector product.
+    If a `path` is given, the vectors are stored in a memory-mapped file.
+    """
+
+    def __init__(self, dim: int, capacity: int, path: str | None = None):
+        self.dim = dim
+        self.capacity = capacity
+        if path is None:
+            self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        else:
+            mode = "r+" if os.path.exists(path) else "w+"
+            self._vectors = np.memmap(path, dtype=np.float32, mode=mode, shape=(capacity, dim))
+        self.size = 0
+
+    def set(self, slot: int, vector: np.ndarray) -> None:
+        self._vectors[slot] = _normalize(vector)
+        self.size = max(self.size, slot + 1)
+
+    def copy(self, source: int, slot: int) -> None:
+        self._vectors[slot] = self._vectors[source]
+
+    def checksum(self, slot: int) -> str:
+        return hashlib.blake2b(self._vectors[slot].tobytes(), digest_size=8).hexdigest()
+
+    def search(self, vector: np.ndarray, k: int = 1) -> list[tuple[int, float]]:
+        if self.size == 0:
+            return []
+        scores = self._vectors[: self.size] @ _normalize(vector)
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(slot), float(scores[slot])) for slot in top]
+
+    def flush(self) -> None:
+        if isinstance(self._vectors, np.memmap):
+            self._vectors.flush()
+
+
+class SemanticCache:
+    """
+    Caches agent results by the meaning of the query instead of its exact text.
+
+    Queries are embedded with `llm.embeddings` and looked up in a `VectorIndex`.
+    A lookup is a hit if the most similar cached query has a cosine similarity of at least `threshold`.
+    When `capacity` entries are stored, the least recently used entry is replaced.
+    If a `path` is given, the vectors are stored memory-mapped in `path` and every new entry is
+    appended (in a worker thread) to the log `path + ".jsonl"`, which is compacted when it gets too long.
+    Every log line holds a checksum of its vector, entries whose vector was replaced without
+    the matching log line (e.g. by a crash) are dropped on load.
+    """
+
+    def __init__(
+        self,
+        llm: "LLMAPI",
+        model: str,
+        threshold: float = 0.92,
+        capacity: int = 10000,
+        path: str | None = None,
+    ):
+        self._llm = llm
+        self._model = model
+        self._threshold = threshold
+        self._capacity = capacity
+        self._path = path
+        self._index: VectorIndex | None = None
+        self._entries: list[dict] = []
+        self._clock = 0
+        self._log_lines = 0
+        self._write_lock = asyncio.Lock()
+        if path is not None and os.path.exists(path + ".jsonl"):
+            self._load(path)
+
+    async def embed(self, text: str) -> np.ndarray:
+        vectors = await asyncio.to_thread(self._llm.embeddings, self._model, [text])
+        return np.asarray(vectors[0], dtype=np.float32)
+
+    async def lookup(self, text: str) -> tuple[str | None, np.ndarray]:
+        """Returns the cached result (or None) and the embedding of the text for `store`."""
+        vector = await self.embed(text)
+        if self._index is not None:
+            for slot, score in self._index.search(vector, k=1):
+                if score >= self._threshold:
+                    CACHE_LOOKUPS.inc(result="hit")
+                    self._entries[slot]["last_used"] = self._tick()
+                    return self._entries[slot]["result"], vector
+        CACHE_LOOKUPS.inc(result="miss")
+        return None, vector
+
+    async def store(self, text: str, vector: np.ndarray, result: str) -> None:
+        if self._index is None:
+            self._index = VectorIndex(len(vector), self._capacity, self._path)
+        entry = {"text": text, "result": result, "last_used": self._tick()}
+        if len(self._entries) < self._capacity:
+            slot = len(self._entries)
+            self._entries.append(entry)
+        else:
+            slot = min(range(len(self._entries)), key=lambda i: self._entries[i]["last_used"])
+            self._entries[slot] = entry
+        self._index.set(slot, vector)
+        if self._path is not None:
+            line = self._log_line(slot, entry)
+            async with self._write_lock:
+                if self._log_lines >= 2 * self._capacity:
+                    await asyncio.to_thread(self._rewrite, self._log_snapshot())
+                else:
+                    await asyncio.to_thread(self._append, line)
+
+    async def save(self) -> None:
+        """Rewrite the log with only the current entries."""
+        if self._path is None or self._index is None:
+            return
+        async with self._write_lock:
+            await asyncio.to_thread(self._rewrite, self._log_snapshot())
+
+    def _log_snapshot(self) -> list[str]:
+        # oldest first, so the recency order survives a reload
+        return [
+            self._log_line(slot, entry)
+            for slot, entry in sorted(enumerate(self._entries), key=lambda item: item[1]["last_used"])
+        ]
+
+    def _log_line(self, slot: int, entry: dict) -> str:
+        assert self._index is not None
+        record = {"slot": slot, "text": entry["text"], "result": entry["result"], "checksum": self._index.checksum(slot)}
+        return json.dumps(record) + "\n"
+
+    def _append(self, line: str) -> None:
+        assert self._path is not None and self._index is not None
+        self._index.flush()
+        if not os.path.exists(self._path + ".jsonl"):
+            line = json.dumps({"dim": self._index.dim, "capacity": self._capacity}) + "\n" + line
+        with open(self._path + ".jsonl", "a") as f:
+            f.write(line)
+        self._log_lines += 1
+
+    def _rewrite(self, lines: list[str]) -> None:
+        assert self._path is not None and self._index is not None
+        self._index.flush()
+        header = json.dumps({"dim": self._index.dim, "capacity": self._capacity}) + "\n"
+        with open(self._path + ".jsonl.tmp", "w") as f:
+            f.write(header)
+            f.writelines(lines)
+        os.replace(self._path + ".jsonl.tmp", self._path + ".jsonl")
+        self._log_lines = len(lines)
+
+    def _load(self, path: str) -> None:
+        with open(path + ".jsonl") as f:
+            header = json.loads(f.readline())
+            if header["capacity"] != self._capacity:
+                raise ValueError(f"Cache at '{path}' was created with capacity {header['capacity']}.")
+            entries: dict[int, dict] = {}
+            checksums: dict[int, str] = {}
+            corrupted = False
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    corrupted = True  # a partially written line of an interrupted process
+                    continue
+                self._log_lines += 1
+                entries[record["slot"]] = {"text": record["text"], "result": record["result"], "last_used": self._tick()}
+                checksums[record["slot"]] = record["checksum"]
+        self._index = VectorIndex(header["dim"], self._capacity, path)
+        # Drop slots whose vector does not belong to their last log line and close the gaps
+        valid = [slot for slot in sorted(entries) if self._index.checksum(slot) == checksums[slot]]
+        for new_slot, slot in enumerate(valid):
+            if new_slot != slot:
+                self._index.copy(slot, new_slot)
+        self._entries = [entries[slot] for slot in valid]
+        self._index.size = len(self._entries)
+        if corrupted or valid != list(range(len(entries))):
+            self._rewrite(self._log_snapshot())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
@@ -47,3 +47,4 @@ class ChatCompletionRequest(BaseModel):
 class EmbeddingRequest(BaseModel):
     model: str
     input: str | List[str]
+    encoding_format: Optional[str] = "float"
@@ -0,0 +1,206 @@
+"""
+Run a graph over every record of a JSONL or CSV file.
+
+    python -m micro_graph.batch my_module:graph input.jsonl output.jsonl --concurrency 16
+
+`my_module:graph` is a `Node` or a function returning a `Node`. Every record is passed to
+the graph as keyword arguments and a line `{"id": ..., "result": ...}` (or `"error"`)
+is appended to the output file. Records with a result in the output file are skipped,
+so an interrupted run can simply be restarted.
+"""
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Any, Iterable, Iterator, TextIO
+import argparse
+import asyncio
+import csv
+import importlib
+import json
+import os
+import sys
+
+from micro_graph.micro_graph import Node
+from micro_graph.output_writer import OutputWriter
+
+
+class _DiscardQueue:
+    def put_nowait(self, item: Any) -> None:
+        pass
+
+
+@dataclass
+class BatchStats:
+    processed: int = 0
+    errors: int = 0
+    skipped: int = 0
+    started_at: float = field(default_factory=monotonic)
+
+    def summary(self) -> str:
+        elapsed = max(monotonic() - self.started_at, 1e-9)
+        error_rate = 100.0 * self.errors / self.processed if self.processed else 0.0
+        return (
+            f"processed {self.processed} ({self.processed / elapsed:.1f}/s), "
+            f"errors {self.errors} ({error_rate:.1f}%), skipped {self.skipped}, {elapsed:.0f}s elapsed"
+        )
+
+
+def read_records(path: str) -> Iterator[dict]:
+    """Stream the records of a JSONL or CSV file (by file extension) one by one."""
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def completed_ids(path: str) -> set[str]:
+    """Ids of all records with a result in an output file of a previous run."""
+    done: set[str] = set()
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a partially written line of an interrupted run
+                if "error" not in entry:
+                    done.add(str(entry["id"]))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _ends_with_partial_line(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+    except FileNotFoundError:
+        return False
+
+
+def load_graph(spec: str) -> Node:
+    """Load a graph from `module:attribute`, calling the attribute if it is a factory."""
+    module_name, _, attribute = spec.partition(":")
+    if not attribute:
+        raise ValueError(f"Expected 'module:attribute', got '{spec}'.")
+    graph = getattr(importlib.import_module(module_name), attribute)
+    if not isinstance(graph, Node) and callable(graph):
+        graph = graph()
+    if not isinstance(graph, Node):
+        raise TypeError(f"'{spec}' is not a Node or a function returning a Node.")
+    return graph
+
+
+async def run_batch(
+    graph: Node,
+    records: Iterable[dict],
+    output_path: str,
+    concurrency: int = 8,
+    ordered: bool = False,
+    id_field: str = "id",
+    resume: bool = True,
+    progress_interval: float = 10.0,
+    progress_file: TextIO | None = None,
+) -> BatchStats:
+    """
+    Run `graph` for every record with at most `concurrency` records in flight.
+
+    With `ordered`, results are written in input order, which holds back at most
+    `4 * concurrency` finished results while waiting for a slow record.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be positive")
+    stats = BatchStats()
+    done = completed_ids(output_path) if resume else set()
+    output = OutputWriter(queue=_DiscardQueue())  # type: ignore
+    pending: set[asyncio.Task] = set()
+    finished: dict[int, dict] = {}
+    next_to_write = 0
+    last_progress = monotonic()
+
+    async def process(seq: int, record_id: str, record: dict) -> tuple[int, dict]:
+        try:
+            result = await graph(output, {}, **record)
+            return seq, {"id": record_id, "result": result}
+        except Exception as e:
+            return seq, {"id": record_id, "error": f"{type(e).__name__}: {e}"}
+
+    with open(output_path, "a" if resume else "w") as out:
+        if resume and _ends_with_partial_line(output_path):
+            out.write("\n")  # do not append to the partially written line of an interrupted run
+
+        def write(entry: dict) -> None:
+            stats.processed += 1
+            stats.errors += "error" in entry
+            out.write(json.dumps(entry, default=str) + "\n")
+            out.flush()
+
+        async def wait_for_any() -> None:
+            nonlocal next_to_write, last_progress
+            completed, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in completed:
+                pending.discard(task)
+                seq, entry = task.result()
+                if ordered:
+                    finished[seq] = entry
+                else:
+                    write(entry)
+            while next_to_write in finished:
+                write(finished.pop(next_to_write))
+                next_to_write += 1
+            if progress_file is not None and monotonic() - last_progress >= progress_interval:
+                print(stats.summary(), file=progress_file, flush=True)
+                last_progress = monotonic()
+
+        seq = 0
+        for index, record in enumerate(records):
+            record_id = str(record.get(id_field, index))
+            if record_id in done:
+                stats.skipped += 1
+                continue
+            while len(pending) >= concurrency or (ordered and seq - next_to_write >= 4 * concurrency):
+                await wait_for_any()
+            pending.add(asyncio.create_task(process(seq, record_id, record)))
+            seq += 1
+        while pending:
+            await wait_for_any()
+    if progress_file is not None:
+        print(stats.summary(), file=progress_file, flush=True)
+    return stats
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m micro_graph.batch", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("graph", help="The graph to run as 'module:attribute' (a Node or a function returning a Node).")
+    parser.add_argument("input", help="The input records (.jsonl or .csv).")
+    parser.add_argument("output", help="The output file (.jsonl), also used as checkpoint.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Records processed at the same time.")
+    parser.add_argument("--ordered", action="store_true", help="Write results in input order.")
+    parser.add_argument("--id-field", default="id", help="Field identifying a record (default: line number).")
+    parser.add_argument("--restart", action="store_true", help="Overwrite the output instead of skipping completed records.")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress reports.")
+    args = parser.parse_args(argv)
+
+    stats = asyncio.run(
+        run_batch(
+            load_graph(args.graph),
+            read_records(args.input),
+            args.output,
+            concurrency=args.concurrency,
+            ordered=args.ordered,
+            id_field=args.id_field,
+            resume=not args.restart,
+            progress_interval=args.progress_interval,
+            progress_file=sys.stderr,
+        )
+    )
+    return 1 if stats.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+from contextvars import ContextVar, Token
+from time import monotonic
+from typing import Any, Awaitable
+import asyncio
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline:
+    """
+    A time budget (in seconds) for a whole graph run.
+
+    While a deadline is active (`with Deadline(5.0): ...` or `await Deadline(5.0).run(node(output, shared))`)
+    every node, retry, LLM and tool call sees the remaining time via `Deadline.current()`
+    and is cancelled once the budget is exhausted, raising `DeadlineExceeded`.
+    Nested deadlines never extend the budget of the outer deadline.
+
+    Nodes can report their best result so far with `report_partial`. If `return_partial`
+    is set, `run` returns this partial result instead of raising `DeadlineExceeded`.
+    """
+
+    def __init__(self, timeout: float | None = None, return_partial: bool = False):
+        self.expires_at: float | None = None if timeout is None else monotonic() + timeout
+        self.return_partial = return_partial
+        self.partial: Any = None
+        self._parent: Deadline | None = None
+        self._tokens: list[tuple[Token, "Deadline | None"]] = []
+
+    @staticmethod
+    def current() -> "Deadline | None":
+        return _current_deadline.get()
+
+    def remaining(self) -> float | None:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and monotonic() >= self.expires_at
+
+    def check(self) -> None:
+        if self.expired:
+            raise DeadlineExceeded("Deadline exceeded.")
+
+    def report_partial(self, result: Any) -> None:
+        deadline: Deadline | None = self
+        while deadline is not None:
+            deadline.partial = result
+            deadline = deadline._parent
+
+    async def run(self, awaitable: Awaitable) -> Any:
+        """Await `awaitable` (e.g. a graph run) within this deadline."""
+        with self:
+            try:
+                return await awaitable
+            except DeadlineExceeded:
+                if self.return_partial:
+                    return self.partial
+                raise
+
+    def __enter__(self) -> "Deadline":
+        parent = _current_deadline.get()
+        self._tokens.append((_current_deadline.set(self), self._parent))
+        if not self._is_ancestor_of(parent):  # re-entering an active deadline keeps its parents
+            self._parent = parent
+            if parent is not None and parent.expires_at is not None:
+                if self.expires_at is None or parent.expires_at < self.expires_at:
+                    self.expires_at = parent.expires_at
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        token, self._parent = self._tokens.pop()
+        _current_deadline.reset(token)
+
+    def _is_ancestor_of(self, deadline: "Deadline | None") -> bool:
+        while deadline is not None:
+            if deadline is self:
+                return True
+            deadline = deadline._parent
+        return False
+
+
+_current_deadline: ContextVar[Deadline | None] = ContextVar("micro_graph_deadline", default=None)
+
+
+def remaining_time() -> float | None:
+    """The remaining time of the active deadline or None if there is no deadline."""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    deadline.check()
+    return deadline.remaining()
+
+
+async def run_with_timeout(awaitable: Awaitable, timeout: float | None = None) -> Any:
+    """
+    Await `awaitable` within the active deadline and an optional timeout.
+
+    Raises `DeadlineExceeded` if the deadline is exhausted and `TimeoutError` if only the timeout is.
+    """
+    try:
+        remaining = remaining_time()
+    except DeadlineExceeded:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    if remaining is None and timeout is None:
+        return await awaitable
+    deadline_first = remaining is not None and (timeout is None or remaining <= timeout)
+    try:
+        return await asyncio.wait_for(_wrap_timeouts(awaitable), remaining if deadline_first else timeout)
+    except _InnerTimeout as e:
+        raise e.error  # raised by the awaitable itself, e.g. a nested timeout
+    except asyncio.TimeoutError:
+        deadline = _current_deadline.get()
+        if deadline_first or (deadline is not None and deadline.expired):
+            raise DeadlineExceeded("Deadline exceeded.") from None
+        raise TimeoutError(f"Timed out after {timeout} seconds.") from None
+
+
+class _InnerTimeout(Exception):
+    def __init__(self, error: BaseException):
+        super().__init__(error)
+        self.error = error
+
+
+async def _wrap_timeouts(awaitable: Awaitable) -> Any:
+    # Tells the timeouts of `awaitable` apart from the timeout of `wait_for` (both are `TimeoutError`s)
+    try:
+        return await awaitable
+    except (TimeoutError, asyncio.TimeoutError) as e:
+        raise _InnerTimeout(e) from None
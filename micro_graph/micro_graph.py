@@ -1,20 +1,26 @@
+from time import perf_counter
 from typing import Any, Callable, Coroutine
 import asyncio
 
+from micro_graph.deadline import DeadlineExceeded, run_with_timeout
+from micro_graph.metrics import NODE_DURATION, NODE_ERRORS
 from micro_graph.output_writer import OutputWriter
+from micro_graph.shared_state import SharedState, ConflictPolicy
 
 GraphResult = dict[str, Any] | None
 NodeResult = GraphResult | tuple[str, GraphResult] | str
 RunFunction = Callable[[OutputWriter, dict], Coroutine[Any, Any, NodeResult]]
 
 
-async def _run_with_retries(function, max_retries, **kwargs):
+async def _run_with_retries(function, max_retries, timeout=None, **kwargs):
     if max_retries < 0:
         raise ValueError("max_retries must be non-negative")
     e = RuntimeError(f"Execution failed after {max_retries} retries.")
     for _ in range(max_retries + 1):
         try:
-            return await function(**kwargs)
+            return await run_with_timeout(function(**kwargs), timeout)
+        except DeadlineExceeded:
+            raise
         except Exception as exc:
             e = exc
     raise e
@@ -41,17 +47,36 @@ class Node:
     and the `run` defines what happens when a node is executed.
     Optionally for paralell processing:
         `prep` defines the task inputs, `run` processes a single task, and `post` combines results.
+        If `shared` is a `SharedState`, every parallel task writes to its own fork and
+        the forks are merged before `post` using the `conflict_policy`.
+    Every attempt of `run` is limited by `timeout` (seconds) and the `Deadline` of the graph run.
     """
 
-    def __init__(self, run: RunFunction | None = None, max_retries: int = 0):
+    def __init__(
+        self,
+        run: RunFunction | None = None,
+        max_retries: int = 0,
+        conflict_policy: ConflictPolicy = "last_write_wins",
+        timeout: float | None = None,
+        name: str | None = None,
+    ):
         self._next_nodes: dict[str, Node] = {}
+        # used to label metrics, defaults to the run function or the class name
+        self.name = name or getattr(run, "__qualname__", None) or type(self).__name__
         self._max_retries = max_retries
+        self._timeout = timeout
+        self._conflict_policy = conflict_policy
         if run is not None:
             self.run = run  # type: ignore
 
-    def then(self, default: "Node", **kwargs) -> "Node":
+    def then(self, default: "Node | list[Node]", **kwargs: "Node | list[Node]") -> "Node":
+        """
+        Set the next node per action. A list of nodes is run in parallel and joined (see `ForkJoinNode`).
+        Returns the default next node (or the join of the list).
+        """
+        default = _as_node(default)
         self._next_nodes["default"] = default
-        self._next_nodes.update(kwargs)
+        self._next_nodes.update({action: _as_node(node) for action, node in kwargs.items()})
         return default
 
     async def prep(self, output: OutputWriter, shared: dict, **kwargs) -> list[GraphResult]:
@@ -66,20 +91,20 @@ class Node:
         return results[0] if results else None
 
     async def __call__(
-        self, output: OutputWriter, shared: dict, only_this_node=False, **kwargs
+        self,
+        output: OutputWriter,
+        shared: dict,
+        only_this_node=False,
+        **kwargs,
     ) -> GraphResult:
-        tasks: list[GraphResult] = await self.prep(output, shared, **kwargs)
-        task_results: list[NodeResult] = list(
-            await asyncio.gather(
-                *[
-                    _run_with_retries(
-                        self.run, self._max_retries, output=output, shared=shared, **(result or {})
-                    )
-                    for result in tasks
-                ]
-            )
-        )
-        result: NodeResult = await self.post(output, shared, task_results)
+        start = perf_counter()
+        try:
+            result: NodeResult = await self._execute(output, shared, **kwargs)
+        except Exception:
+            NODE_ERRORS.inc(node=self.name)
+            raise
+        finally:
+            NODE_DURATION.observe(perf_counter() - start, node=self.name)
         if isinstance(result, tuple):
             action, result = result
         elif isinstance(result, str):
@@ -96,3 +121,109 @@ class Node:
                 )
             return await self._next_nodes[action](output, shared, only_this_node, **(result or {}))
         return result
+
+    async def _execute(self, output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        tasks: list[GraphResult] = await self.prep(output, shared, **kwargs)
+        task_shared: list[dict] = [shared] * len(tasks)
+        if isinstance(shared, SharedState) and len(tasks) > 1:
+            task_shared = [shared.fork() for _ in tasks]
+        task_results: list[NodeResult] = list(
+            await asyncio.gather(
+                *[
+                    _run_with_retries(
+                        self.run,
+                        self._max_retries,
+                        self._timeout,
+                        output=output,
+                        shared=s,
+                        **(result or {}),
+                    )
+                    for result, s in zip(tasks, task_shared)
+                ]
+            )
+        )
+        if task_shared and task_shared[0] is not shared:
+            shared.merge(task_shared, policy=self._conflict_policy)  # type: ignore
+        return await self.post(output, shared, task_results)
+
+
+class ForkJoinNode(Node):
+    """
+    Runs several branches (each a node and its successors) concurrently and joins their results.
+
+    `wait_for` is the number of branches that must finish (default all of them), e.g. 1 for the first one.
+    Once enough branches have finished, the remaining ones are cancelled unless `cancel_pending` is False,
+    then they keep running in the background and their results are ignored.
+    `post` receives the results of all branches in branch order (None for unfinished branches)
+    and by default merges the result dicts in branch order.
+    """
+
+    def __init__(
+        self,
+        branches: list[Node],
+        wait_for: int | None = None,
+        cancel_pending: bool = True,
+        conflict_policy: ConflictPolicy = "last_write_wins",
+    ):
+        super().__init__(conflict_policy=conflict_policy)
+        if not branches:
+            raise ValueError("A ForkJoinNode needs at least one branch.")
+        if wait_for is not None and not 1 <= wait_for <= len(branches):
+            raise ValueError(f"wait_for must be between 1 and {len(branches)}")
+        self._branches = branches
+        self._wait_for = len(branches) if wait_for is None else wait_for
+        self._cancel_pending = cancel_pending
+        self._background: set[asyncio.Task] = set()
+
+    async def post(
+        self, output: OutputWriter, shared: dict, results: list[NodeResult]
+    ) -> NodeResult:
+        merged: dict[str, Any] = {}
+        for result in results:
+            if isinstance(result, dict):
+                merged.update(result)
+        return merged
+
+    async def _execute(self, output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        branch_shared: list[dict] = [shared] * len(self._branches)
+        if isinstance(shared, SharedState):
+            branch_shared = [shared.fork() for _ in self._branches]
+        tasks = [
+            asyncio.create_task(branch(output, s, **kwargs))
+            for branch, s in zip(self._branches, branch_shared)
+        ]
+        results: list[NodeResult] = [None] * len(tasks)
+        finished: list[int] = []
+        errors: list[BaseException] = []
+        pending = set(tasks)
+        joined = False
+        try:
+            while len(finished) < self._wait_for:
+                if len(finished) + len(pending) < self._wait_for:
+                    raise errors[0]
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    exception = task.exception()
+                    if exception is not None:
+                        errors.append(exception)
+                    else:
+                        results[tasks.index(task)] = task.result()
+                        finished.append(tasks.index(task))
+            joined = True
+        finally:
+            if self._cancel_pending or not joined:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+            else:
+                self._background.update(pending)
+                for task in pending:
+                    task.add_done_callback(self._background.discard)
+        if isinstance(shared, SharedState):
+            forks = [branch_shared[i] for i in sorted(finished)]
+            shared.merge(forks, policy=self._conflict_policy)  # type: ignore
+        return await self.post(output, shared, results)
+
+
+def _as_node(node: Node | list[Node]) -> Node:
+    return ForkJoinNode(node) if isinstance(node, list) else node
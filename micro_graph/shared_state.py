@@ -0,0 +1,148 @@
+from typing import Any, Callable, Iterator, Mapping, MutableMapping
+
+ConflictPolicy = str | Callable[[str, list[Any]], Any]
+
+_MISSING = object()
+
+
+class MergeConflictError(KeyError):
+    pass
+
+
+class SharedState(MutableMapping):
+    """
+    A dict-like shared state that can be forked cheaply for parallel tasks.
+
+    A fork is a copy-on-write overlay: reads fall through to the parent, writes
+    and deletes are recorded locally. The overlays of parallel tasks are merged
+    back deterministically (in task order) with `merge`, so no task can lose
+    the writes of another one and nothing of size `len(shared)` is copied.
+
+    Conflict policies (when several forks write the same key):
+        `last_write_wins` the fork that comes last in task order wins (default).
+        `first_write_wins` the fork that comes first in task order wins.
+        `error` raise a `MergeConflictError`.
+        A callable `(key, values) -> value` that resolves the conflict.
+        It only receives the written values; if forks delete a key that other forks write,
+        the written values win (and a single written value is used without calling the policy).
+
+    `snapshot` returns a frozen copy in O(1), the data is only copied on the next write.
+    """
+
+    def __init__(self, data: Mapping | None = None, parent: MutableMapping | None = None):
+        self._parent = parent
+        self._data: dict = dict(data or {})
+        self._deleted: set = set()
+        self._frozen = False
+        self._copy_on_write = False
+        self.version = 0
+
+    def fork(self) -> "SharedState":
+        return SharedState(parent=self)
+
+    def snapshot(self) -> "SharedState":
+        if self._parent is not None:
+            return SharedState(self.to_dict()).snapshot()
+        self._copy_on_write = True
+        snapshot = SharedState()
+        snapshot._data = self._data
+        snapshot._frozen = True
+        snapshot.version = self.version
+        return snapshot
+
+    def changes(self) -> tuple[dict, set]:
+        """The local writes and deletes of this overlay."""
+        return self._data, self._deleted
+
+    def commit(self) -> None:
+        """Apply the local writes and deletes of this overlay to the parent."""
+        if self._parent is None:
+            raise ValueError("Only a fork of a state can be committed.")
+        for key in self._deleted:
+            self._parent.pop(key, None)
+        self._parent.update(self._data)
+        self._data, self._deleted = {}, set()
+
+    def merge(self, forks: list["SharedState"], policy: ConflictPolicy = "last_write_wins") -> None:
+        """Merge the changes of forks (in the given order) into this state."""
+        writes: dict[Any, list[Any]] = {}
+        for fork in forks:
+            data, deleted = fork.changes()
+            for key in deleted:
+                writes.setdefault(key, []).append(_MISSING)
+            for key, value in data.items():
+                writes.setdefault(key, []).append(value)
+        for key, values in writes.items():
+            value = values[-1] if len(values) == 1 else _resolve(key, values, policy)
+            if value is _MISSING:
+                self.pop(key, None)
+            else:
+                self[key] = value
+        for fork in forks:
+            fork._data, fork._deleted = {}, set()
+
+    def to_dict(self) -> dict:
+        return {key: self[key] for key in self}
+
+    def __getitem__(self, key: Any) -> Any:
+        if key in self._data:
+            return self._data[key]
+        if key in self._deleted or self._parent is None:
+            raise KeyError(key)
+        return self._parent[key]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._before_write()
+        self._data[key] = value
+        self._deleted.discard(key)
+
+    def __delitem__(self, key: Any) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._before_write()
+        self._data.pop(key, None)
+        if self._parent is not None:
+            self._deleted.add(key)
+
+    def __contains__(self, key: Any) -> bool:
+        if key in self._data:
+            return True
+        if key in self._deleted or self._parent is None:
+            return False
+        return key in self._parent
+
+    def __iter__(self) -> Iterator:
+        yield from self._data
+        if self._parent is not None:
+            for key in self._parent:
+                if key not in self._data and key not in self._deleted:
+                    yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"SharedState({self.to_dict()!r}, version={self.version})"
+
+    def _before_write(self) -> None:
+        if self._frozen:
+            raise TypeError("A snapshot of a SharedState is read-only.")
+        if self._copy_on_write:
+            self._data = dict(self._data)
+            self._copy_on_write = False
+        self.version += 1
+
+
+def _resolve(key: Any, values: list[Any], policy: ConflictPolicy) -> Any:
+    if callable(policy):
+        written = [value for value in values if value is not _MISSING]
+        if not written:
+            return _MISSING
+        return written[0] if len(written) == 1 else policy(key, written)
+    if policy == "last_write_wins":
+        return values[-1]
+    if policy == "first_write_wins":
+        return values[0]
+    if policy == "error":
+        raise MergeConflictError(f"Conflicting writes to key '{key}' from parallel tasks.")
+    raise ValueError(f"Unknown conflict policy: {policy}")
@@ -0,0 +1,53 @@
+import asyncio
+import json
+import pytest
+from micro_graph import Node, NodeResult, OutputWriter
+from micro_graph.batch import read_records, run_batch
+
+
+@pytest.fixture
+def graph() -> Node:
+    async def square(output: OutputWriter, shared: dict, x: str = "0", **kwargs) -> NodeResult:
+        x = int(x)
+        await asyncio.sleep(0.001 * (10 - x))  # later records finish first
+        if x == 3:
+            raise ValueError("three")
+        return {"square": x * x}
+
+    return Node(run=square)
+
+
+def read_output(path) -> list[dict]:
+    return [json.loads(line) for line in open(path)]
+
+
+@pytest.mark.asyncio
+async def test_ordered_with_errors(graph, tmp_path):
+    records = [{"id": str(i), "x": str(i)} for i in range(10)]
+    stats = await run_batch(graph, records, str(tmp_path / "out.jsonl"), concurrency=4, ordered=True)
+    output = read_output(tmp_path / "out.jsonl")
+    assert [entry["id"] for entry in output] == [str(i) for i in range(10)]
+    assert output[2] == {"id": "2", "result": {"square": 4}}
+    assert output[3] == {"id": "3", "error": "ValueError: three"}
+    assert (stats.processed, stats.errors) == (10, 1)
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_completed_records(graph, tmp_path):
+    (tmp_path / "in.csv").write_text("x\n1\n2\n3\n")
+    out = str(tmp_path / "out.jsonl")
+    await run_batch(graph, read_records(str(tmp_path / "in.csv")), out)
+    stats = await run_batch(graph, read_records(str(tmp_path / "in.csv")), out)
+    assert (stats.processed, stats.skipped, stats.errors) == (1, 2, 1)  # only the failed record is retried
+    assert len(read_output(out)) == 4
+
+
+@pytest.mark.asyncio
+async def test_resume_after_truncated_line(graph, tmp_path):
+    out = tmp_path / "out.jsonl"
+    out.write_text('{"id": "0", "result": {"square": 0}}\n{"id": "1", "resu')
+    stats = await run_batch(graph, [{"id": str(i), "x": str(i)} for i in range(3)], str(out))
+    assert (stats.processed, stats.skipped) == (2, 1)
+    lines = out.read_text().splitlines()
+    assert lines[1] == '{"id": "1", "resu'
+    assert sorted(json.loads(line)["id"] for line in lines[2:]) == ["1", "2"]
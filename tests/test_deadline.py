@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from micro_graph import Node, NodeResult, OutputWriter, Deadline, DeadlineExceeded
+
+
+@pytest.fixture
+def output() -> OutputWriter:
+    return OutputWriter()
+
+
+def slow_graph() -> Node:
+    async def step(output: OutputWriter, shared: dict, iter: int = 0, **kwargs) -> NodeResult:
+        await asyncio.sleep(0.1)
+        Deadline.current().report_partial({"iter": iter})
+        return {"iter": iter + 1}
+
+    node = Node(run=step)
+    node.then(default=node)
+    return node
+
+
+@pytest.mark.asyncio
+async def test_deadline_exceeded(output):
+    with pytest.raises(DeadlineExceeded):
+        await Deadline(0.25).run(slow_graph()(output, {}))
+
+
+@pytest.mark.asyncio
+async def test_deadline_returns_partial(output):
+    result = await Deadline(0.25, return_partial=True).run(slow_graph()(output, {}))
+    assert result == {"iter": 1}
+
+
+@pytest.mark.asyncio
+async def test_node_timeout_is_retried(output):
+    attempts = []
+
+    async def flaky(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        attempts.append(1)
+        if len(attempts) == 1:
+            await asyncio.sleep(1.0)
+        return {"attempts": len(attempts)}
+
+    result = await Node(run=flaky, max_retries=1, timeout=0.05)(output, {})
+    assert result == {"attempts": 2}
+
+
+@pytest.mark.asyncio
+async def test_nested_node_timeout_is_not_a_deadline(output):
+    attempts = []
+
+    async def slow(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        await asyncio.sleep(1.0)
+
+    async def outer(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        attempts.append(1)
+        await Node(run=slow, timeout=0.05)(output, shared)
+
+    deadline = Deadline(5.0, return_partial=True)
+    deadline.report_partial({"stale": True})
+    with pytest.raises(TimeoutError) as e:
+        await deadline.run(Node(run=outer, max_retries=2)(output, {}))
+    assert not isinstance(e.value, DeadlineExceeded)
+    assert len(attempts) == 3
+
+
+@pytest.mark.asyncio
+async def test_reentering_a_deadline(output):
+    async def sub(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        Deadline.current().report_partial({"sub": True})
+        return {"sub": True}
+
+    async def step(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        return await Deadline.current().run(Node(run=sub)(output, shared))
+
+    outer = Deadline(1.0)
+    inner = Deadline(5.0)
+    with outer:
+        assert await inner.run(Node(run=step)(output, {})) == {"sub": True}
+    assert inner.expires_at == outer.expires_at
+    assert inner._parent is None and inner.partial == outer.partial == {"sub": True}
+
+
+@pytest.mark.asyncio
+async def test_deadline_is_a_regular_kwarg(output):
+    async def first(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        return {"deadline": "2026-11-01"}
+
+    async def second(output: OutputWriter, shared: dict, deadline: str = "", **kwargs) -> NodeResult:
+        return {"due": deadline}
+
+    node = Node(run=first)
+    node.then(default=Node(run=second))
+    assert await node(output, {}) == {"due": "2026-11-01"}
@@ -0,0 +1,90 @@
+import asyncio
+import base64
+import struct
+import time
+import pytest
+from micro_graph.ai.cache import LRUCache
+from micro_graph.ai.embedding_batcher import EmbeddingBatcher, encode_base64
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    def embeddings(self, model: str, input: list[str]) -> list[list[float]]:
+        self.calls.append(list(input))
+        return [[float(len(text)), 0.5] for text in input]
+
+    def get_models(self) -> list[str]:
+        return ["m"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_batched_and_deduplicated():
+    llm = CountingEmbeddings()
+    batcher = EmbeddingBatcher(llm, max_wait=0.01)  # type: ignore
+    first, second = await asyncio.gather(batcher.embed("m", ["a", "bb"]), batcher.embed("m", ["bb", "ccc", "a"]))
+    assert first == [[1.0, 0.5], [2.0, 0.5]]
+    assert second == [[2.0, 0.5], [3.0, 0.5], [1.0, 0.5]]
+    assert llm.calls == [["a", "bb", "ccc"]]
+
+
+@pytest.mark.asyncio
+async def test_batches_are_split_and_cached():
+    llm = CountingEmbeddings()
+    batcher = EmbeddingBatcher(llm, max_batch_size=2, cache=LRUCache(max_size=10))  # type: ignore
+    vectors = await batcher.embed("m", ["a", "bb", "ccc", "dddd", "eeeee"])
+    assert [vector[0] for vector in vectors] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert sorted(len(call) for call in llm.calls) == [1, 2, 2]
+    await batcher.embed("m", ["a", "eeeee"])
+    assert len(llm.calls) == 3  # served from the cache
+
+
+@pytest.mark.asyncio
+async def test_errors_are_passed_to_all_waiters():
+    class FailingEmbeddings:
+        def embeddings(self, model: str, input: list[str]) -> list[list[float]]:
+            raise KeyError(model)
+
+    batcher = EmbeddingBatcher(FailingEmbeddings())  # type: ignore
+    with pytest.raises(KeyError):
+        await batcher.embed("unknown", ["a"])
+
+
+def test_lru_cache():
+    cache = LRUCache(max_size=2, ttl=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert "b" not in cache and cache.get("a") == 1 and cache.get("c") == 3
+    expiring = LRUCache(max_size=2, ttl=0.01)
+    expiring.put("a", 1)
+    time.sleep(0.02)
+    assert expiring.get("a") is None
+
+
+def test_encode_base64_round_trip():
+    vector = [1.0, -2.5, 0.125]
+    data = base64.b64decode(encode_base64(vector))
+    assert list(struct.unpack("<3f", data)) == vector
+
+
+@pytest.mark.asyncio
+async def test_embeddings_endpoint():
+    httpx = pytest.importorskip("httpx")
+    pytest.importorskip("fastapi")
+    from micro_graph.ai.openai_server import create_app
+
+    app = create_app({}, embedding_llm=CountingEmbeddings())  # type: ignore
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/embeddings", json={"model": "m", "input": "abc", "encoding_format": "base64"})
+        assert response.status_code == 200
+        data = base64.b64decode(response.json()["data"][0]["embedding"])
+        assert list(struct.unpack("<2f", data)) == [3.0, 0.5]
+        response = await client.post("/embeddings", json={"model": "m", "input": "abc", "encoding_format": "int8"})
+        assert response.status_code == 400
+        await client.post("/embeddings", json={"model": "nope", "input": "abc"})
+        metrics = (await client.get("/metrics")).text
+        assert 'endpoint="/embeddings",model="m"' in metrics
+        assert 'model="nope"' not in metrics and 'endpoint="/embeddings",model="unknown"' in metrics
@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from micro_graph import Node, ForkJoinNode, NodeResult, OutputWriter, SharedState
+
+
+def branch(name: str, delay: float) -> Node:
+    async def run(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        await asyncio.sleep(delay)
+        shared[name] = True
+        return {name: delay}
+
+    return Node(run=run)
+
+
+@pytest.fixture
+def output() -> OutputWriter:
+    return OutputWriter()
+
+
+@pytest.mark.asyncio
+async def test_fork_join_all(output):
+    async def done(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        return {"joined": sorted(kwargs)}
+
+    start = Node()
+    start.then([branch("a", 0.05), branch("b", 0.05), branch("c", 0.05)]).then(Node(run=done))
+    loop = asyncio.get_running_loop()
+    t0 = loop.time()
+    result = await start(output, {})
+    assert result == {"joined": ["a", "b", "c"]}
+    assert loop.time() - t0 < 0.12  # branches ran concurrently
+
+
+@pytest.mark.asyncio
+async def test_fork_join_quorum_cancels_pending(output):
+    shared = SharedState()
+    join = ForkJoinNode([branch("slow", 1.0), branch("fast", 0.01), branch("medium", 0.02)], wait_for=2)
+    result = await join(output, shared)
+    assert result == {"fast": 0.01, "medium": 0.02}
+    assert shared.to_dict() == {"fast": True, "medium": True}
+
+
+@pytest.mark.asyncio
+async def test_fork_join_branch_error(output):
+    async def fail(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        raise RuntimeError("branch failed")
+
+    with pytest.raises(RuntimeError):
+        await ForkJoinNode([branch("a", 0.01), Node(run=fail)])(output, {})
+    result = await ForkJoinNode([branch("a", 0.01), Node(run=fail)], wait_for=1)(output, {})
+    assert result == {"a": 0.01}
@@ -0,0 +1,34 @@
+import asyncio
+import time
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("pydantic")
+
+from micro_graph import Deadline, DeadlineExceeded, OutputWriter  # noqa: E402
+from micro_graph.ai.llm import FakeLLM  # noqa: E402
+from micro_graph.ai.llm_generation import LLMGenerateNode  # noqa: E402
+
+
+class TricklingLLM(FakeLLM):
+    def chat_stream(self, model, messages, max_tokens=-1):
+        for i in range(20):
+            time.sleep(0.05)
+            yield f"{i} "
+
+
+@pytest.mark.asyncio
+async def test_streaming_output():
+    queue: asyncio.Queue = asyncio.Queue()
+    node = LLMGenerateNode(FakeLLM(response="a b c"), "fake", "{query}", output="answer")
+    assert await node(OutputWriter(queue=queue), {}, query="q") == {"response": "a b c "}
+    assert not queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_streaming_is_cancelled_by_deadline():
+    node = LLMGenerateNode(TricklingLLM(), "fake", "{query}", output="answer")
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        await Deadline(0.2).run(node(OutputWriter(), {}, query="q"))
+    assert time.perf_counter() - start < 0.5
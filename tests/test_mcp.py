@@ -0,0 +1,60 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+import pytest
+
+pytest.importorskip("fastmcp")
+
+from fastmcp.exceptions import ToolError  # noqa: E402
+from micro_graph.ai.mcp import MCPNode  # noqa: E402
+
+SERVER = Path(__file__).parent.parent / "examples" / "mcp_stdio_server.py"
+
+
+@pytest.fixture
+def node() -> MCPNode:
+    return MCPNode(f"{sys.executable} {SERVER}", mode="stdio", idempotent_tools=["add"], cache_ttl=0.5)
+
+
+@pytest.mark.asyncio
+async def test_calls_are_concurrent_and_deduplicated(node):
+    await node.call_tools([("sleep", {"seconds": 0})])  # start the server
+    start = time.perf_counter()
+    results = await node.call_tools(
+        [("sleep", {"seconds": 0.4}), ("add", {"a": 1, "b": 2}), ("sleep", {"seconds": 0.4}), ("add", {"b": 2, "a": 1})]
+    )
+    assert time.perf_counter() - start < 0.75
+    assert [result["data"] for result in results] == ["Slept 0.4 seconds.", 3.0, "Slept 0.4 seconds.", 3.0]
+    assert node.tool_stats["sleep"].calls == 3  # not idempotent, so both sleeps are made
+    assert node.tool_stats["add"].calls == 1
+    assert node.tool_stats["sleep"].max_seconds >= 0.4
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_and_ttl(node):
+    await node.call_tools([("add", {"a": 1, "b": 2})])
+    result = (await node.call_tools([("add", {"a": 1, "b": 2})]))[0]
+    assert result["data"] == 3.0
+    assert (node.tool_stats["add"].calls, node.tool_stats["add"].cache_hits) == (1, 1)
+
+    await asyncio.sleep(0.6)  # the cached result expires
+    await node.call_tools([("add", {"a": 1, "b": 2})])
+    assert (node.tool_stats["add"].calls, node.tool_stats["add"].cache_hits) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_failing_call_keeps_other_results(node):
+    calls = [("add", {"a": 1, "b": 2}), ("add", {"a": "x", "b": 2})]
+    with pytest.raises(ToolError):
+        await node.call_tools(calls)
+    assert node.tool_stats["add"].errors == 1
+
+    results = await node.call_tools(calls, return_exceptions=True)
+    assert results[0]["data"] == 3.0  # type: ignore
+    assert isinstance(results[1], ToolError)
+    assert (node.tool_stats["add"].calls, node.tool_stats["add"].cache_hits) == (3, 1)  # the success was cached
+
+    result = await node(None, {}, tool_calls=[{"name": "add", "arguments": {"a": 2, "b": 2}}, {"name": "missing"}])  # type: ignore
+    assert result["results"][0]["data"] == 4.0
+    assert result["results"][1]["is_error"] and result["results"][1]["error"].startswith("ToolError")
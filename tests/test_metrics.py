@@ -0,0 +1,55 @@
+import pytest
+from micro_graph import Node, NodeResult, OutputWriter
+from micro_graph.metrics import MetricsRegistry, NODE_DURATION, NODE_ERRORS
+
+
+def test_render_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("model",))
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    in_flight = registry.gauge("in_flight", "In flight.")
+    requests.inc(model='a"b')
+    requests.inc(2, model='a"b')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    in_flight.set_function(lambda: 3)
+    assert registry.counter("requests_total", "Requests.", ("model",)) is requests
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{model="a\\"b"} 3',
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 2',
+        "latency_seconds_sum 0.55",
+        "latency_seconds_count 2",
+        "# HELP in_flight In flight.",
+        "# TYPE in_flight gauge",
+        "in_flight 3",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_node_metrics():
+    class FailingNode(Node):
+        async def run(self, output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+            raise RuntimeError("failed")
+
+    before = NODE_DURATION.count(node="FailingNode")
+    with pytest.raises(RuntimeError):
+        await FailingNode()(OutputWriter(), {})
+    assert NODE_DURATION.count(node="FailingNode") == before + 1
+    assert NODE_ERRORS.value(node="FailingNode") >= 1
+
+
+@pytest.mark.asyncio
+async def test_node_metrics_are_labelled_by_run_function():
+    async def greet(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        return None
+
+    await Node(run=greet)(OutputWriter(), {})
+    await Node(run=greet, name="hello")(OutputWriter(), {})
+    assert NODE_DURATION.count(node="test_node_metrics_are_labelled_by_run_function.<locals>.greet") == 1
+    assert NODE_DURATION.count(node="hello") == 1
@@ -0,0 +1,109 @@
+import asyncio
+import time
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("pydantic")
+
+from micro_graph import Deadline, Node, NodeResult, OutputWriter  # noqa: E402
+from micro_graph.ai.automatic_refinement_feedback_loop import (  # noqa: E402
+    automatic_refinement_feedback_loop,
+    _compress_feedback,
+    _converged,
+)
+from micro_graph.ai.llm_generation import LLMGenerateNode  # noqa: E402
+
+
+class ScriptedLLM:
+    """Plans are numbered by generation, decisions are taken from a list."""
+
+    def __init__(self, decisions: list[str], same_plan: bool = False, latency: float = 0.02):
+        self.decisions = decisions
+        self.same_plan = same_plan
+        self.latency = latency
+        self.generations = 0
+
+    def chat(self, model, messages, max_tokens=-1) -> str:
+        time.sleep(self.latency)
+        prompt = messages[-1].text()
+        if "meta reviewer" in prompt:
+            return self.decisions.pop(0) if self.decisions else "reject"
+        if prompt.startswith("FEEDBACK"):
+            return "Add more detail."
+        self.generations += 1
+        return "plan" if self.same_plan else f"plan {self.generations}"
+
+
+def make_loop(llm: ScriptedLLM, **kwargs):
+    planner = LLMGenerateNode(llm=llm, model="m", prompt_template="PLAN {query} {feedback}", field="plan", shared=True)  # type: ignore
+    return automatic_refinement_feedback_loop(planner, llm, "m", "FEEDBACK {plan} {old_feedback}", **kwargs)  # type: ignore
+
+
+async def run(loop, shared: dict) -> str:
+    queue: asyncio.Queue = asyncio.Queue()
+    await loop(OutputWriter(queue=queue), shared, query="q")
+    return "".join(queue.get_nowait() for _ in range(queue.qsize()))
+
+
+@pytest.mark.asyncio
+async def test_pipelined_discards_speculation_on_accept():
+    shared: dict = {}
+    text = await run(make_loop(ScriptedLLM(["accept"]), pipelined=True), shared)
+    assert shared["plan"] == "plan 1"
+    assert "iteration 2" not in text
+
+
+@pytest.mark.asyncio
+async def test_pipelined_replays_speculation_on_reject():
+    llm = ScriptedLLM(["reject", "accept"])
+    shared: dict = {}
+    text = await run(make_loop(llm, pipelined=True, max_iterations=5), shared)
+    assert shared["plan"] == "plan 2"
+    assert "iteration 2 of 5" in text
+    assert "iteration 3" not in text
+
+
+@pytest.mark.asyncio
+async def test_not_pipelined_runs_on_shared():
+    seen: list[type] = []
+
+    async def remember(output: OutputWriter, shared: dict, **kwargs) -> NodeResult:
+        seen.append(type(shared))
+        shared["calls"] = shared.get("calls", 0) + 1
+        raise ValueError("failed")
+
+    loop = automatic_refinement_feedback_loop(Node(run=remember), ScriptedLLM([]), "m", "FEEDBACK")  # type: ignore
+    shared: dict = {}
+    with pytest.raises(ValueError):
+        await loop(OutputWriter(), shared)
+    assert seen == [dict]
+    assert shared["calls"] == 1  # the writes before the error are kept
+
+
+@pytest.mark.asyncio
+async def test_convergence_stops_early():
+    llm = ScriptedLLM([], same_plan=True)
+    text = await run(make_loop(llm, max_iterations=5, convergence_threshold=0.9), {})
+    assert llm.generations == 2
+    assert "Output converged" in text
+
+
+@pytest.mark.asyncio
+async def test_deadline_returns_last_iteration():
+    loop = make_loop(ScriptedLLM([], latency=0.2), max_iterations=5)
+    shared: dict = {}
+    result = await Deadline(0.7, return_partial=True).run(loop(OutputWriter(queue=asyncio.Queue()), shared, query="q"))
+    assert result["plan"] == shared["plan"] == "plan 1"
+
+
+def test_converged():
+    assert not _converged(None, "abc", 0.9)
+    assert not _converged("abc", "abc", None)
+    assert _converged("a long plan", "a long plan!", 0.9)
+    assert not _converged("a long plan", "something else", 0.9)
+
+
+def test_feedback_history_is_capped():
+    history = ["one\ncommon", "two\ncommon", "three\ncommon"]
+    assert _compress_feedback(history, max_entries=2) == "two\nthree\ncommon\n"
+    assert _compress_feedback(history, max_entries=5) == "one\ntwo\nthree\ncommon\n"
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from micro_graph import OutputWriter
+from micro_graph.ai.replay_buffer import ReplayBuffer
+
+
+@pytest.mark.asyncio
+async def test_resume_while_writing():
+    buffer = ReplayBuffer(max_chunks=3)
+    output = OutputWriter(queue=buffer)  # type: ignore
+
+    async def write():
+        for i in range(4):
+            output.write(f"chunk{i}")
+            await asyncio.sleep(0.01)
+        buffer.put_nowait(None)
+
+    task = asyncio.create_task(write())
+    first = []
+    async for i, chunk in buffer.stream():
+        first.append(chunk)
+        if i == 1:
+            break  # client disconnects
+    resumed = [chunk async for _, chunk in buffer.stream(last_id=1)]
+    await task
+    assert first == ["chunk0", "chunk1"]
+    assert resumed == ["chunk2", "chunk3"]
+    assert not buffer.can_resume(-1)  # chunk0 was dropped from the buffer
+    with pytest.raises(LookupError):
+        async for _ in buffer.stream():
+            pass
+
+
+@pytest.mark.asyncio
+async def test_undelivered_chunks_are_kept():
+    buffer = ReplayBuffer(max_chunks=10)
+    output = OutputWriter(queue=buffer)  # type: ignore
+    reader = buffer.stream()
+    for i in range(50):  # writes without yielding to the event loop
+        output.write(f"chunk{i}")
+    buffer.put_nowait(None)
+    chunks = [chunk async for _, chunk in reader]
+    assert chunks == [f"chunk{i}" for i in range(50)]
+    assert buffer.can_resume(39) and not buffer.can_resume(38)  # only delivered chunks were dropped
+
+
+@pytest.mark.asyncio
+async def test_abandoned():
+    buffer = ReplayBuffer()
+    buffer.put_nowait("chunk")
+    stream = buffer.stream()
+    async for _ in stream:
+        assert not buffer.abandoned(ttl=0.0)
+        break
+    await stream.aclose()  # the client disconnects
+    assert buffer.abandoned(ttl=0.0)
+    buffer.put_nowait(None)
+    assert not buffer.abandoned(ttl=0.0)
+
+
+@pytest.mark.asyncio
+async def test_server_evicts_finished_streams():
+    httpx = pytest.importorskip("httpx")
+    pytest.importorskip("fastapi")
+    from micro_graph.ai.openai_server import create_app
+
+    async def agent(output: OutputWriter, messages: list, max_tokens: int):
+        output.default("hello")
+
+    app = create_app({"m": agent}, replay_ttl=0.2)
+    request = {"model": "m", "messages": [], "stream": True}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        stream = (await client.post("/chat/completions", json=request)).text
+        event_id = stream.split("\n")[0].removeprefix("id: ")
+        response = await client.post("/chat/completions", json=request, headers={"Last-Event-ID": event_id})
+        assert response.status_code == 200 and response.text.endswith("data: [DONE]\n\n")
+        await asyncio.sleep(0.3)  # the server is idle, the buffer is evicted anyway
+        response = await client.post("/chat/completions", json=request, headers={"Last-Event-ID": event_id})
+        assert response.status_code == 410
+
+        request_id = (await client.post("/chat/completions", json={**request, "stream": False})).json()["id"]
+        response = await client.post("/chat/completions", json=request, headers={"Last-Event-ID": f"{request_id}:0"})
+        assert response.status_code == 410  # only streamed requests can be resumed
@@ -0,0 +1,74 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from micro_graph.ai.semantic_cache import SemanticCache, VectorIndex  # noqa: E402
+
+
+class TopicEmbeddings:
+    """Texts mentioning the same topic get (almost) the same vector."""
+
+    TOPICS = ["weather", "cake", "trip"]
+
+    def embeddings(self, model: str, input: list[str]) -> list[list[float]]:
+        return [[1.0 if topic in text else 0.01 for topic in self.TOPICS] for text in input]
+
+
+def test_vector_index_search_order():
+    index = VectorIndex(dim=2, capacity=4)
+    index.set(0, np.array([1.0, 0.0]))
+    index.set(1, np.array([0.0, 1.0]))
+    index.set(2, np.array([1.0, 1.0]))
+    results = index.search(np.array([1.0, 0.2]), k=3)
+    assert [slot for slot, _ in results] == [0, 2, 1]
+    assert results[0][1] == pytest.approx(1.0 / np.sqrt(1.04))
+
+
+@pytest.mark.asyncio
+async def test_threshold_hit_and_miss():
+    cache = SemanticCache(TopicEmbeddings(), "m", threshold=0.95)  # type: ignore
+    result, vector = await cache.lookup("weather in NYC")
+    assert result is None
+    await cache.store("weather in NYC", vector, "sunny")
+    assert (await cache.lookup("NYC weather today"))[0] == "sunny"
+    assert (await cache.lookup("bake a cake"))[0] is None
+
+
+@pytest.mark.asyncio
+async def test_lru_replacement_and_reload(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    cache = SemanticCache(TopicEmbeddings(), "m", threshold=0.95, capacity=2, path=path)  # type: ignore
+    for text in ["weather", "cake"]:
+        _, vector = await cache.lookup(text)
+        await cache.store(text, vector, f"{text} answer")
+    assert (await cache.lookup("weather today"))[0] == "weather answer"  # "cake" is now least recently used
+    _, vector = await cache.lookup("trip")
+    await cache.store("trip", vector, "trip answer")
+    assert len(cache) == 2
+    assert (await cache.lookup("cake"))[0] is None
+
+    reloaded = SemanticCache(TopicEmbeddings(), "m", threshold=0.95, capacity=2, path=path)  # type: ignore
+    assert len(reloaded) == 2
+    assert (await reloaded.lookup("weather"))[0] == "weather answer"
+    assert (await reloaded.lookup("trip"))[0] == "trip answer"
+    assert (await reloaded.lookup("cake"))[0] is None
+
+
+@pytest.mark.asyncio
+async def test_reload_drops_vectors_without_log_line(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    cache = SemanticCache(TopicEmbeddings(), "m", threshold=0.95, capacity=2, path=path)  # type: ignore
+    for text in ["weather", "cake"]:
+        _, vector = await cache.lookup(text)
+        await cache.store(text, vector, f"{text} answer")
+    # a crash after replacing the vector of "weather" and before logging the new entry
+    _, vector = await cache.lookup("trip")
+    cache._index.set(0, vector)  # type: ignore
+    cache._index.flush()  # type: ignore
+
+    reloaded = SemanticCache(TopicEmbeddings(), "m", threshold=0.95, capacity=2, path=path)  # type: ignore
+    assert len(reloaded) == 1
+    assert (await reloaded.lookup("trip"))[0] is None
+    assert (await reloaded.lookup("weather"))[0] is None
+    assert (await reloaded.lookup("cake"))[0] == "cake answer"
+    assert len(SemanticCache(TopicEmbeddings(), "m", capacity=2, path=path)) == 1  # type: ignore
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from micro_graph import Node, NodeResult, OutputWriter, SharedState, MergeConflictError
+
+
+class FanOutNode(Node):
+    async def prep(self, output: OutputWriter, shared: dict, **kwargs):
+        return [{"i": i} for i in range(3)]
+
+    async def run(self, output: OutputWriter, shared: dict, i: int = 0, **kwargs) -> NodeResult:
+        await asyncio.sleep(0.01 * (3 - i))  # finish in reverse order
+        shared[f"task_{i}"] = i
+        shared["last"] = i
+        return {"i": i}
+
+    async def post(self, output: OutputWriter, shared: dict, results: list[NodeResult]) -> NodeResult:
+        return {"results": results}
+
+
+def test_fork_is_copy_on_write():
+    shared = SharedState({"a": 1, "b": 2})
+    fork = shared.fork()
+    fork["a"] = 10
+    del fork["b"]
+    assert shared.to_dict() == {"a": 1, "b": 2}
+    assert fork.to_dict() == {"a": 10}
+    fork.commit()
+    assert shared.to_dict() == {"a": 10}
+
+
+def test_snapshot():
+    shared = SharedState({"a": 1})
+    snapshot = shared.snapshot()
+    shared["a"] = 2
+    assert snapshot["a"] == 1 and shared["a"] == 2
+    with pytest.raises(TypeError):
+        snapshot["a"] = 3
+
+
+@pytest.mark.asyncio
+async def test_parallel_merge_is_deterministic():
+    shared = SharedState({"input": "x"})
+    result = await FanOutNode()(OutputWriter(), shared)
+    assert result == {"results": [{"i": 0}, {"i": 1}, {"i": 2}]}
+    assert shared.to_dict() == {"input": "x", "task_0": 0, "task_1": 1, "task_2": 2, "last": 2}
+
+
+@pytest.mark.asyncio
+async def test_conflict_policies():
+    shared = SharedState()
+    await FanOutNode(conflict_policy="first_write_wins")(OutputWriter(), shared)
+    assert shared["last"] == 0
+
+    await FanOutNode(conflict_policy=lambda key, values: sum(values))(OutputWriter(), shared)
+    assert shared["last"] == 3
+
+    with pytest.raises(MergeConflictError):
+        await FanOutNode(conflict_policy="error")(OutputWriter(), SharedState())
+
+
+@pytest.mark.asyncio
+async def test_conflict_policy_with_deletes():
+    class DeleteOrWriteNode(FanOutNode):
+        async def run(self, output: OutputWriter, shared: dict, i: int = 0, **kwargs) -> NodeResult:
+            if i == 0:
+                del shared["last"]
+            else:
+                shared["last"] = i
+            return {"i": i}
+
+    shared = SharedState({"last": -1})
+    await DeleteOrWriteNode(conflict_policy=lambda key, values: max(values))(OutputWriter(), shared)
+    assert shared["last"] == 2
+
+    shared = SharedState({"last": -1})
+    await DeleteOrWriteNode(conflict_policy="first_write_wins")(OutputWriter(), shared)
+    assert "last" not in shared